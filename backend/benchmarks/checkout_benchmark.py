@@ -0,0 +1,136 @@
+"""Flash-sale checkout: many parallel orders for a few low-stock products.
+
+Calls the order placement engine directly against MongoDB and then checks
+that stock never went negative, that the stock taken equals the quantity in
+the orders written, and that retried Idempotency-Keys created no duplicates:
+
+    python -m benchmarks.checkout_benchmark --checkouts 500 --stock 100
+    python -m benchmarks.checkout_benchmark --mode standalone   # bulk write + compensation path
+
+Exits 1 if any check fails. The benchmark's products and orders are removed afterwards.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from bson import ObjectId
+from fastapi import HTTPException
+from config.database import db_manager
+from config.indexes import ensure_indexes
+from models.order import Order
+from utils import orders
+from utils.orders import place_order
+
+SHIPPING = {"address": "1 Bench Road", "city": "Pune", "phoneNo": "9000000000",
+            "postalCode": "411001", "country": "India", "state": "MH"}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def make_order(rng, product_ids, max_quantity):
+    items = [
+        # Client prices are deliberately wrong: the engine must reprice
+        {"name": "x", "quantity": rng.randint(1, max_quantity), "image": "", "price": 0.01, "product": str(pid)}
+        for pid in rng.sample(product_ids, rng.randint(1, len(product_ids)))
+    ]
+    return Order(shippingInfo=SHIPPING, orderItems=items, paymentInfo={"id": "pi_bench", "status": "succeeded"})
+
+
+async def checkout(db, order, user, key, latencies, outcomes):
+    start = time.perf_counter()
+    try:
+        _, created = await place_order(db, order, user, key)
+        outcome = "created" if created else "replayed"
+    except HTTPException as e:
+        outcome = f"http {e.status_code}"
+    except Exception as e:
+        outcome = type(e).__name__
+    latencies.append((time.perf_counter() - start) * 1000)
+    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="replica", choices=["replica", "standalone"],
+                        help="replica uses transactions, standalone the compensating bulk write")
+    parser.add_argument("--checkouts", type=int, default=500, help="parallel checkout attempts")
+    parser.add_argument("--products", type=int, default=3)
+    parser.add_argument("--stock", type=int, default=100, help="initial stock per product")
+    parser.add_argument("--max-quantity", type=int, default=3)
+    parser.add_argument("--retry-rate", type=float, default=0.2, help="share of checkouts sent twice with one key")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    await db_manager.connect(args.mode)
+    if args.mode != db_manager.mode:
+        print(f"Could not connect in {args.mode} mode")
+        return 1
+    db = db_manager.get_db("orders")
+    await ensure_indexes(db)
+    print(f"Mode: {db_manager.mode}, transactions: {orders.USE_TRANSACTIONS and db_manager.mode == 'replica'}")
+
+    run = uuid.uuid4().hex[:8]
+    product_ids = [ObjectId() for _ in range(args.products)]
+    await db.products.insert_many([
+        {"_id": pid, "name": f"Flash sale {run} #{i}", "price": 100.0 + i, "stock": args.stock,
+         "category": "Electronics", "seller": "Bench", "images": [{"image": "/images/products/1.jpg"}]}
+        for i, pid in enumerate(product_ids)
+    ])
+
+    rng = random.Random(args.seed)
+    users = [f"bench-{run}-{i}" for i in range(args.checkouts)]
+    attempts = []
+    for user in users:
+        order = make_order(rng, product_ids, args.max_quantity)
+        key = uuid.uuid4().hex
+        attempts.append((order, user, key))
+        if rng.random() < args.retry_rate:
+            attempts.append((order, user, key))
+    rng.shuffle(attempts)
+
+    latencies, outcomes = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*[checkout(db, order, user, key, latencies, outcomes) for order, user, key in attempts])
+    elapsed = time.perf_counter() - start
+
+    failures = []
+    written = await db.orders.find({"user": {"$in": users}}).to_list(length=None)
+    for pid in product_ids:
+        product = await db.products.find_one({"_id": pid}, {"stock": 1, "price": 1})
+        sold = sum(i["quantity"] for o in written for i in o["orderItems"] if i["product"] == str(pid))
+        print(f"  product {pid}: stock {args.stock} -> {product['stock']}, sold {sold}")
+        if product["stock"] < 0:
+            failures.append(f"oversold {pid}: stock {product['stock']}")
+        if args.stock - product["stock"] != sold:
+            failures.append(f"stock taken for {pid} ({args.stock - product['stock']}) != quantity ordered ({sold})")
+        if any(i["price"] != product["price"] for o in written for i in o["orderItems"] if i["product"] == str(pid)):
+            failures.append(f"client price accepted for {pid}")
+    if len({o["idempotencyKey"] for o in written}) != len(written):
+        failures.append("duplicate orders for one Idempotency-Key")
+    if len(written) != outcomes.get("created", 0):
+        failures.append(f"{outcomes.get('created', 0)} orders reported created but {len(written)} written")
+
+    await db.orders.delete_many({"user": {"$in": users}})
+    await db.products.delete_many({"_id": {"$in": product_ids}})
+    await db_manager.disconnect()
+
+    print(f"{len(attempts)} attempts in {elapsed:.2f}s ({len(attempts) / elapsed:.0f}/s): {outcomes}")
+    print(f"latency p50={statistics.median(latencies):.1f}ms p99={percentile(latencies, 99):.1f}ms "
+          f"max={max(latencies):.1f}ms")
+    if failures:
+        print("FAILED:")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("OK: no oversell, stock matches orders, no duplicate orders")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,115 @@
+"""Deliver a burst of mail through the dispatcher into a local aiosmtpd sink.
+
+Checks that every message arrives exactly once and reports throughput and how
+many SMTP sessions the burst needed. With --outbox it also runs through the
+MongoDB outbox and checks that every row ended up sent with its body removed:
+
+    pip install aiosmtpd
+    python -m benchmarks.email_benchmark --emails 500
+    python -m benchmarks.email_benchmark --emails 500 --outbox --mode standalone
+
+Exits 1 if any message is missing or duplicated. The outbox rows it wrote are removed afterwards.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+
+class Sink:
+    """aiosmtpd handler that records subjects and the client connections they came over."""
+
+    def __init__(self):
+        self.subjects = []
+        self.peers = set()
+
+    async def handle_DATA(self, server, session, envelope):
+        for line in envelope.content.decode("utf8", errors="replace").splitlines():
+            if line.startswith("Subject: "):
+                self.subjects.append(line[len("Subject: "):])
+                break
+        self.peers.add(session.peer)
+        return "250 Message accepted for delivery"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--smtp-port", type=int, default=8025)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--outbox", action="store_true", help="persist through the email_outbox collection")
+    parser.add_argument("--mode", default="replica", choices=["replica", "standalone"])
+    args = parser.parse_args()
+
+    # Only this benchmark needs the SMTP server
+    from aiosmtpd.controller import Controller
+
+    os.environ.update({"SMTP_HOST": "127.0.0.1", "SMTP_PORT": str(args.smtp_port), "SMTP_STARTTLS": "false",
+                       "SMTP_FROM_EMAIL": "bench@favcart.test", "SMTP_FROM_NAME": "FavCart Bench"})
+    from config.database import db_manager
+    from utils.email import email_dispatcher, send_email
+
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=args.smtp_port)
+    controller.start()
+
+    db = None
+    if args.outbox:
+        await db_manager.connect(args.mode)
+        db = db_manager.get_db()
+
+    run = uuid.uuid4().hex[:8]
+    expected = {f"bench {run} #{i}" for i in range(args.emails)}
+    await email_dispatcher.start()
+    failures = []
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            send_email(subject, f"<p>{subject}</p>", f"user{i}@favcart.test")
+            for i, subject in enumerate(sorted(expected))
+        ])
+        queued = time.perf_counter() - start
+
+        while len(sink.subjects) < args.emails and time.perf_counter() - start < args.timeout:
+            await asyncio.sleep(0.05)
+        # Give any duplicate a moment to show up too
+        await asyncio.sleep(0.5)
+        elapsed = time.perf_counter() - start
+
+        received = [s for s in sink.subjects if s in expected]
+        missing = len(expected - set(received))
+        duplicates = len(received) - len(set(received))
+        print(f"emails {args.emails}, enqueued in {queued * 1000:.0f} ms, delivered in {elapsed:.2f} s "
+              f"({len(set(received)) / elapsed:.0f}/s)")
+        print(f"SMTP sessions {len(sink.peers)}, missing {missing}, duplicates {duplicates}, "
+              f"dispatcher {email_dispatcher.stats()}")
+        if missing:
+            failures.append(f"{missing} messages never arrived")
+        if duplicates:
+            failures.append(f"{duplicates} messages arrived more than once")
+
+        if db is not None:
+            rows = db.email_outbox.find({"subject": {"$in": list(expected)}})
+            unfinished = with_body = 0
+            async for row in rows:
+                unfinished += row["status"] != "sent"
+                with_body += "message" in row
+            print(f"outbox rows not sent {unfinished}, rows still holding a body {with_body}")
+            if unfinished or with_body:
+                failures.append("outbox rows not finished or not redacted")
+            await db.email_outbox.delete_many({"subject": {"$in": list(expected)}})
+    finally:
+        await email_dispatcher.stop()
+        controller.stop()
+        if db is not None:
+            await db_manager.disconnect()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,69 @@
+"""Measure request errors and latency spikes while DatabaseManager switches modes.
+
+Needs the local replica set (scripts/start-local-replica.sh) plus whatever
+MONGO_URI_STANDALONE points at. A steady read load runs against the active
+handle, and a forced switch happens halfway through:
+
+    python -m benchmarks.failover_benchmark --duration 20
+    python -m benchmarks.failover_benchmark --cold   # old behaviour: fresh connect on switch
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from config.database import db_manager
+
+
+async def reader(stop_at, samples, errors):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            # Fetch the handle per request, as the routers do
+            await db_manager.get_db("catalog").products.find_one({})
+            samples.append((start, (time.perf_counter() - start) * 1000))
+        except Exception:
+            errors.append(start)
+        await asyncio.sleep(0.005)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--target", default="standalone", choices=["standalone", "replica"])
+    parser.add_argument("--cold", action="store_true", help="skip the warm standby and reconnect from scratch")
+    args = parser.parse_args()
+
+    initial = "replica" if args.target == "standalone" else "standalone"
+    await db_manager.connect(initial)
+    if not args.cold:
+        await db_manager.standby_task
+
+    samples, errors = [], []
+    begin = time.perf_counter()
+    stop_at = begin + args.duration
+    readers = [asyncio.create_task(reader(stop_at, samples, errors)) for _ in range(args.concurrency)]
+
+    await asyncio.sleep(args.duration / 2)
+    switch_at = time.perf_counter()
+    if args.cold:
+        await db_manager.connect(args.target)
+    else:
+        await db_manager.failover(args.target)
+    switch_ms = (time.perf_counter() - switch_at) * 1000
+
+    await asyncio.gather(*readers)
+    await db_manager.disconnect()
+
+    before = [ms for t, ms in samples if t < switch_at]
+    around = [ms for t, ms in samples if switch_at <= t < switch_at + 2]
+    after = [ms for t, ms in samples if t >= switch_at + 2]
+    print(f"switch took {switch_ms:.1f}ms ({'cold connect' if args.cold else 'warm standby'})")
+    for label, window in (("before", before), ("switch +2s", around), ("after", after)):
+        if window:
+            print(f"{label:<12} n={len(window):6d} p50={statistics.median(window):7.2f}ms max={max(window):8.2f}ms")
+    print(f"errors: {len(errors)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,325 @@
+"""End-to-end load test: replay a mixed workload against a running API.
+
+Bring up MongoDB (../scripts/start-local-replica.sh for the replica set, or a
+plain mongod), seed it, and start the server:
+    python seeder.py --users 1000 --products 20000 --orders 50000 --drop
+    RATE_LIMIT_IP=1000000/1 RATE_LIMIT_ACCOUNT=1000000/1 uvicorn main:app --port 8000
+(all virtual users share one client IP, so lift the auth rate limits) then:
+    python -m benchmarks.load_test --duration 60 --report load-report.json
+    python -m benchmarks.load_test --baseline load-report.json --report new.json
+    python -m benchmarks.load_test --compare new.json --baseline load-report.json
+
+Virtual users log in as the seeder's userN@favcart.test accounts; user0 is the
+admin. Each account gets its own client and cookie jar, so its orders and
+reviews are made as that account. Every request is timed per endpoint, and the JSON report holds
+throughput, error counts and p50/p95/p99 latency. With --baseline the run is
+compared endpoint by endpoint, and the exit status is 1 if anything regressed
+by more than --threshold percent.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime
+import httpx
+
+API = "/api/v1"
+
+# Relative weight of each scenario in the mix
+MIX = {
+    "browse": 30,
+    "search": 15,
+    "detail": 25,
+    "reviews": 5,
+    "login": 5,
+    "order": 8,
+    "review": 7,
+    "admin": 5,
+}
+
+SEARCH_TERMS = ["laptop", "phone", "headphones", "camera", "book", "shoes", "watch", "food", "sports", "outdoor"]
+
+SHIPPING = {
+    "address": "1 Load Test Lane", "city": "Bengaluru", "phoneNo": "9999999999",
+    "postalCode": "560001", "country": "IN", "state": "KA",
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def add(self, endpoint, millis, status):
+        self.latencies.setdefault(endpoint, []).append(millis)
+        codes = self.statuses.setdefault(endpoint, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+        if status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "statuses": self.statuses[endpoint],
+                "throughput": round(len(samples) / elapsed, 2),
+                "p50": round(percentile(samples, 50), 2),
+                "p95": round(percentile(samples, 95), 2),
+                "p99": round(percentile(samples, 99), 2),
+                "max": round(max(samples), 2),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "endpoints": endpoints,
+            "total": {
+                "requests": total,
+                "errors": sum(e["errors"] for e in endpoints.values()),
+                "throughput": round(total / elapsed, 2),
+            },
+        }
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        # Anonymous traffic (browsing, the login scenario); logged-in traffic uses per-user clients
+        self.client = None
+        self.clients = []
+        self.recorder = Recorder()
+        self.sessions = []
+        self.admin = None
+        self.products = []
+        self.categories = []
+
+    def new_client(self, connections):
+        client = httpx.AsyncClient(base_url=self.args.base_url, timeout=30,
+                                   limits=httpx.Limits(max_connections=connections))
+        self.clients.append(client)
+        return client
+
+    async def request(self, endpoint, method, path, session=None, **kwargs):
+        client = session or self.client
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, API + path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 599
+        self.recorder.add(endpoint, (time.perf_counter() - start) * 1000, status)
+        return response
+
+    @staticmethod
+    def credentials(index, password_pool):
+        return {"email": f"user{index}@favcart.test", "password": f"password{index % password_pool}"}
+
+    async def login(self, index, connections):
+        """A client logged in as userN: the token cookie lives in its own jar."""
+        client = self.new_client(connections)
+        response = await client.post(API + "/login", json=self.credentials(index, self.args.password_pool))
+        response.raise_for_status()
+        return client
+
+    async def setup(self):
+        self.client = self.new_client(self.args.concurrency + 10)
+        # Log in every virtual user up front so the measured window is the mix only
+        indexes = list(range(1, self.args.users + 1))
+        per_user = max(1, -(-self.args.concurrency // len(indexes)))
+        self.sessions = await asyncio.gather(*[self.login(i, per_user) for i in indexes])
+        self.admin = await self.login(0, self.args.concurrency)
+
+        response = await self.client.get(API + "/products", params={"sort": "_id", "resPerPage": 100})
+        response.raise_for_status()
+        self.products = [p for p in response.json()["products"] if p.get("stock", 1) > 0]
+        self.categories = sorted({p["category"] for p in self.products if p.get("category")})
+        if not self.products:
+            raise SystemExit("No products found; run seeder.py first")
+
+    # --- Scenarios ---
+
+    async def browse(self, rng, session):
+        params = {"page": rng.randint(1, 20), "fields": "card"}
+        if self.categories and rng.random() < 0.5:
+            params["category"] = rng.choice(self.categories)
+        if rng.random() < 0.3:
+            params["price[lte]"] = rng.choice([50, 200, 1000, 5000])
+        await self.request("GET /products", "GET", "/products", params=params)
+
+    async def search(self, rng, session):
+        await self.request("GET /products?keyword", "GET", "/products", params={"keyword": rng.choice(SEARCH_TERMS), "fields": "card"})
+
+    async def detail(self, rng, session):
+        await self.request("GET /product/{id}", "GET", f"/product/{rng.choice(self.products)['_id']}")
+
+    async def reviews(self, rng, session):
+        await self.request("GET /reviews", "GET", "/reviews", params={"id": rng.choice(self.products)["_id"]})
+
+    async def login_scenario(self, rng, session):
+        index = rng.randint(1, self.args.users)
+        await self.request("POST /login", "POST", "/login", json=self.credentials(index, self.args.password_pool))
+        # The anonymous client must not start sending that account's cookie
+        self.client.cookies.clear()
+
+    async def order(self, rng, session):
+        items = []
+        for product in rng.sample(self.products, min(len(self.products), rng.randint(1, 3))):
+            images = product.get("images") or [{}]
+            items.append({
+                "name": product["name"], "quantity": 1, "image": images[0].get("image", ""),
+                "price": product["price"], "product": product["_id"],
+            })
+        items_price = round(sum(i["price"] * i["quantity"] for i in items), 2)
+        body = {
+            "shippingInfo": SHIPPING,
+            "orderItems": items,
+            "paymentInfo": {"id": f"pi_load_{rng.getrandbits(48):x}", "status": "succeeded"},
+            "itemsPrice": items_price,
+            "taxPrice": round(items_price * 0.05, 2),
+            "shippingPrice": 0.0,
+            "totalPrice": round(items_price * 1.05, 2),
+        }
+        await self.request("POST /order/new", "POST", "/order/new", session, json=body)
+
+    async def review(self, rng, session):
+        body = {"rating": rng.randint(1, 5), "comment": "Load test review", "productId": rng.choice(self.products)["_id"]}
+        await self.request("PUT /review", "PUT", "/review", session, json=body)
+
+    async def admin_lists(self, rng, session):
+        path = rng.choice(["/admin/products", "/admin/orders", "/admin/users"])
+        await self.request(f"GET {path}", "GET", path, self.admin)
+
+    async def worker(self, worker_id, stop_at):
+        rng = random.Random(self.args.seed * 1000 + worker_id)
+        session = self.sessions[worker_id % len(self.sessions)]
+        scenarios = {
+            "browse": self.browse, "search": self.search, "detail": self.detail, "reviews": self.reviews,
+            "login": self.login_scenario, "order": self.order, "review": self.review, "admin": self.admin_lists,
+        }
+        names = list(MIX)
+        weights = [MIX[name] for name in names]
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            await scenarios[name](rng, session)
+            if self.args.think_time:
+                await asyncio.sleep(rng.expovariate(1 / self.args.think_time))
+
+    async def close(self):
+        await asyncio.gather(*[client.aclose() for client in self.clients])
+
+    async def run(self):
+        try:
+            return await self._run()
+        finally:
+            await self.close()
+
+    async def _run(self):
+        await self.setup()
+        if self.args.warmup:
+            await asyncio.gather(*[
+                self.worker(i, time.perf_counter() + self.args.warmup) for i in range(self.args.concurrency)
+            ])
+            self.recorder = Recorder()
+
+        start = time.perf_counter()
+        stop_at = start + self.args.duration
+        await asyncio.gather(*[self.worker(i, stop_at) for i in range(self.args.concurrency)])
+        report = self.recorder.report(time.perf_counter() - start)
+        report["run"] = {
+            "baseUrl": self.args.base_url,
+            "duration": self.args.duration,
+            "concurrency": self.args.concurrency,
+            "users": self.args.users,
+            "seed": self.args.seed,
+            "mix": MIX,
+            "finishedAt": datetime.utcnow().isoformat(),
+        }
+        return report
+
+
+def print_report(report):
+    print(f"{'endpoint':<24} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for endpoint, s in report["endpoints"].items():
+        print(f"{endpoint:<24} {s['requests']:7d} {s['errors']:5d} {s['throughput']:8.1f} "
+              f"{s['p50']:8.2f} {s['p95']:8.2f} {s['p99']:8.2f}")
+    total = report["total"]
+    print(f"{'total':<24} {total['requests']:7d} {total['errors']:5d} {total['throughput']:8.1f}")
+
+
+def compare(report, baseline, threshold):
+    """Return the regressions of `report` against `baseline`, one line each."""
+    limit = 1 + threshold / 100
+    regressions = []
+    print(f"\n{'endpoint':<24} {'p95 base':>9} {'p95 now':>9} {'p99 base':>9} {'p99 now':>9} {'req/s base':>11} {'req/s now':>10}")
+    for endpoint, old in baseline["endpoints"].items():
+        new = report["endpoints"].get(endpoint)
+        if new is None:
+            regressions.append(f"{endpoint}: missing from this run")
+            continue
+        print(f"{endpoint:<24} {old['p95']:9.2f} {new['p95']:9.2f} {old['p99']:9.2f} {new['p99']:9.2f} "
+              f"{old['throughput']:11.1f} {new['throughput']:10.1f}")
+        for pct in ("p50", "p95", "p99"):
+            if new[pct] > old[pct] * limit:
+                regressions.append(f"{endpoint}: {pct} {old[pct]:.2f}ms -> {new[pct]:.2f}ms")
+        if new["throughput"] < old["throughput"] / limit:
+            regressions.append(f"{endpoint}: throughput {old['throughput']:.1f}/s -> {new['throughput']:.1f}/s")
+        old_rate = old["errors"] / old["requests"] if old["requests"] else 0.0
+        new_rate = new["errors"] / new["requests"] if new["requests"] else 0.0
+        if new_rate > old_rate + 0.01:
+            regressions.append(f"{endpoint}: error rate {old_rate:.1%} -> {new_rate:.1%}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of unrecorded load first")
+    parser.add_argument("--concurrency", type=int, default=50, help="virtual users")
+    parser.add_argument("--users", type=int, default=50, help="seeded accounts to log in as (user1..userN)")
+    parser.add_argument("--password-pool", type=int, default=8, help="must match seeder.py --password-pool")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean pause between requests, seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--compare", metavar="REPORT", help="compare an existing report instead of running")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed regression, percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        if not args.baseline:
+            parser.error("--compare needs --baseline")
+        with open(args.compare) as f:
+            report = json.load(f)
+    else:
+        report = await LoadTest(args).run()
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+
+    print_report(report)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0f}%:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,85 @@
+"""Measure catalog latency while the API is hit by a burst of logins.
+
+Start the server first (uvicorn main:app --port 8000), then the command below.
+Most logins will get 429 from the per-IP/per-account limits, which is the point;
+set RATE_LIMIT_IP/RATE_LIMIT_ACCOUNT very high on the server to measure raw bcrypt load instead:
+    python -m benchmarks.login_storm --concurrency 50 --duration 15
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+import httpx
+
+PROBE_PATHS = ["/api/v1/products", "/"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(label, samples):
+    if not samples:
+        print(f"{label:<16} no samples")
+        return
+    print(f"{label:<16} n={len(samples):6d} p50={statistics.median(samples):8.2f}ms "
+          f"p99={percentile(samples, 99):8.2f}ms max={max(samples):8.2f}ms")
+
+
+async def probe(client, stop_at, samples):
+    i = 0
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        await client.get(PROBE_PATHS[i % len(PROBE_PATHS)])
+        samples.append((time.perf_counter() - start) * 1000)
+        i += 1
+        await asyncio.sleep(0.01)
+
+
+async def login_worker(client, credentials, stop_at, samples, statuses):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await client.post("/api/v1/login", json=credentials)
+        samples.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+
+async def ensure_user(client):
+    email = f"storm-{uuid.uuid4().hex[:8]}@example.com"
+    credentials = {"email": email, "password": "storm-password"}
+    response = await client.post("/api/v1/register", json={"name": "Storm", **credentials})
+    response.raise_for_status()
+    return credentials
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0)
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        credentials = await ensure_user(client)
+
+        quiet = []
+        await probe(client, time.perf_counter() + args.duration / 3, quiet)
+
+        storm, logins, statuses = [], [], {}
+        stop_at = time.perf_counter() + args.duration
+        await asyncio.gather(
+            probe(client, stop_at, storm),
+            *[login_worker(client, credentials, stop_at, logins, statuses) for _ in range(args.concurrency)],
+        )
+
+    summarize("catalog (quiet)", quiet)
+    summarize("catalog (storm)", storm)
+    summarize("login", logins)
+    print(f"login throughput: {len(logins) / args.duration:.1f}/s, statuses: {statuses}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Offline stand-in for the Stripe PaymentIntents API.
+
+    uvicorn benchmarks.mock_gateway:app --port 12111
+    STRIPE_API_BASE=http://localhost:12111 uvicorn main:app --port 8000
+
+MOCK_LATENCY_MS and MOCK_FAILURE_RATE shape the responses so retries and the
+circuit breaker can be exercised under load.
+"""
+import asyncio
+import os
+import random
+import uuid
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Mock Payment Gateway")
+
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "80"))
+FAILURE_RATE = float(os.getenv("MOCK_FAILURE_RATE", "0"))
+
+# Idempotency-Key -> stored response, as Stripe does
+responses = {}
+stats = {"requests": 0, "created": 0, "replayed": 0, "failed": 0}
+
+
+@app.post("/v1/payment_intents")
+async def create_payment_intent(request: Request):
+    stats["requests"] += 1
+    await asyncio.sleep(random.uniform(0.5, 1.5) * LATENCY_MS / 1000)
+
+    key = request.headers.get("Idempotency-Key")
+    if key in responses:
+        stats["replayed"] += 1
+        return responses[key]
+
+    if random.random() < FAILURE_RATE:
+        stats["failed"] += 1
+        return JSONResponse(status_code=503, content={"error": {"message": "Mock outage"}})
+
+    form = await request.form()
+    intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+    body = {
+        "id": intent_id,
+        "object": "payment_intent",
+        "amount": int(form.get("amount", 0)),
+        "currency": form.get("currency", "inr"),
+        "status": "requires_payment_method",
+        "client_secret": f"{intent_id}_secret_{uuid.uuid4().hex[:16]}",
+    }
+    if key:
+        responses[key] = body
+    stats["created"] += 1
+    return body
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,113 @@
+"""Compare the $regex keyword path with the text index path on a large catalog.
+
+Usage:
+    python -m benchmarks.search_benchmark --products 100000 --uri mongodb://localhost:27017/favcart_bench
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from motor.motor_asyncio import AsyncIOMotorClient
+from utils.search import ensure_search_index, TEXT_SCORE
+
+WORDS = [
+    "wireless", "bluetooth", "laptop", "phone", "watch", "camera", "speaker", "headphones",
+    "charger", "cable", "keyboard", "mouse", "monitor", "tablet", "portable", "smart",
+    "gaming", "ultra", "pro", "mini", "stainless", "leather", "cotton", "outdoor", "kitchen",
+]
+CATEGORIES = ["Electronics", "Mobile Phones", "Laptops", "Accessories", "Headphones", "Food",
+              "Books", "Clothes/Shoes", "Beauty/Health", "Sports", "Outdoor", "Home"]
+KEYWORDS = ["laptop", "wireless headphones", "smart watch", "gaming", "leather"]
+
+
+def make_product(rng):
+    name = " ".join(rng.sample(WORDS, 3)).title()
+    return {
+        "name": name,
+        "description": " ".join(rng.choices(WORDS, k=20)),
+        "category": rng.choice(CATEGORIES),
+        "price": round(rng.uniform(1, 2000), 2),
+        "ratings": round(rng.uniform(0, 5), 1),
+        "seller": "Bench",
+        "stock": rng.randint(0, 500),
+        "numOfReviews": 0,
+        "reviews": [],
+        "images": [],
+    }
+
+
+async def populate(db, count, seed):
+    existing = await db.products.estimated_document_count()
+    if existing >= count:
+        print(f"Reusing {existing} existing products")
+        return
+
+    await db.products.delete_many({})
+    rng = random.Random(seed)
+    batch = 5000
+    start = time.perf_counter()
+    for offset in range(0, count, batch):
+        docs = [make_product(rng) for _ in range(min(batch, count - offset))]
+        await db.products.insert_many(docs, ordered=False)
+    print(f"Inserted {count} products in {time.perf_counter() - start:.1f}s")
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_query(db, query, text, limit):
+    if text:
+        cursor = db.products.find(query, TEXT_SCORE).sort([("score", TEXT_SCORE["score"])])
+    else:
+        cursor = db.products.find(query)
+    await cursor.limit(limit).to_list(length=limit)
+    await db.products.count_documents(query)
+
+
+async def measure(db, label, build_query, text, iterations, limit):
+    samples = []
+    for _ in range(iterations):
+        for keyword in KEYWORDS:
+            query = build_query(keyword)
+            start = time.perf_counter()
+            await run_query(db, query, text, limit)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"{label:<28} p50={statistics.median(samples):8.2f}ms "
+          f"p95={percentile(samples, 95):8.2f}ms p99={percentile(samples, 99):8.2f}ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/favcart_bench")
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(args.uri)
+    db = client.get_default_database()
+
+    await populate(db, args.products, args.seed)
+    await ensure_search_index(db)
+
+    filters = {"price": {"$gte": 100.0, "$lte": 1500.0}, "ratings": {"$gte": 2.0}}
+
+    await measure(db, "regex", lambda k: {"name": {"$regex": k, "$options": "i"}},
+                  False, args.iterations, args.limit)
+    await measure(db, "text", lambda k: {"$text": {"$search": k}},
+                  True, args.iterations, args.limit)
+    await measure(db, "regex + price/ratings", lambda k: {"name": {"$regex": k, "$options": "i"}, **filters},
+                  False, args.iterations, args.limit)
+    await measure(db, "text + price/ratings", lambda k: {"$text": {"$search": k}, **filters},
+                  True, args.iterations, args.limit)
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
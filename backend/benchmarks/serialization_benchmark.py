@@ -0,0 +1,79 @@
+"""Serialization cost of large list responses: per-handler ObjectId loops plus
+FastAPI's jsonable_encoder and json.dumps, vs BSONResponse rendering raw documents.
+
+No database needed; documents come from the seeder's generator:
+    python -m benchmarks.serialization_benchmark --rounds 20
+"""
+import argparse
+import statistics
+import time
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from seeder import Generator, parse_args as seeder_args
+from utils.responses import BSONResponse
+
+
+def legacy_render(content, nested):
+    # What the handlers used to do: copy-convert _id (and known nested ids), then the generic encoder
+    for doc in content["items"]:
+        doc["_id"] = str(doc["_id"])
+        for field in nested:
+            for child in doc.get(field, []):
+                child["_id"] = str(child["_id"])
+                child["user"] = str(child["user"])
+                child["product"] = str(child["product"])
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_render(content, nested):
+    return BSONResponse(content).body
+
+
+def build_payloads(count):
+    args = seeder_args(["--users", str(count), "--products", str(count), "--orders", str(count)])
+    generator = Generator(args)
+    generator.password_hashes = ["$2b$12$" + "x" * 53]
+
+    products, reviews = [], []
+    for i in range(count):
+        products.append(generator.product(i, reviews))
+    detail = generator.product(0, [])
+    detail_reviews = [r for r in reviews if r["product"] == detail["_id"]] or reviews[:20]
+
+    return [
+        ("products page (4)", lambda: {"success": True, "items": [dict(p) for p in products[:4]]}, ()),
+        ("products page (100)", lambda: {"success": True, "items": [dict(p) for p in products[:100]]}, ()),
+        ("product detail", lambda: {"success": True, "items": [dict(detail, reviews=[dict(r) for r in detail_reviews[:20]])]}, ("reviews",)),
+        (f"admin products ({count})", lambda: {"success": True, "items": [dict(p) for p in products]}, ()),
+        (f"admin orders ({count})", lambda: {"success": True, "items": [generator.order(i) for i in range(count)]}, ()),
+        (f"admin users ({count})", lambda: {"success": True, "items": [generator.user(i) for i in range(count)]}, ()),
+    ]
+
+
+def measure(render, make, nested, rounds):
+    samples = []
+    size = 0
+    for _ in range(rounds):
+        # Fresh documents each round: the legacy path mutates them in place
+        content = make()
+        start = time.perf_counter()
+        size = len(render(content, nested))
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000, help="documents in the admin lists")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'payload':<24} {'legacy ms':>10} {'bson ms':>9} {'speedup':>8} {'bytes':>10}")
+    for label, make, nested in build_payloads(args.count):
+        legacy, _ = measure(legacy_render, make, nested, args.rounds)
+        fast, size = measure(fast_render, make, nested, args.rounds)
+        print(f"{label:<24} {legacy:10.3f} {fast:9.3f} {legacy / fast:7.1f}x {size:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,261 @@
+import asyncio
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from pymongo.write_concern import WriteConcern
 from dotenv import load_dotenv
 import logging
 
 load_dotenv("backend/config/config.env")
 
+# Secondaries lagging further than this are skipped for catalog reads (server minimum is 90s)
+MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS", "90"))
+# Connections the standby client keeps open while waiting to take over
+STANDBY_POOL_SIZE = int(os.getenv("MONGO_STANDBY_POOL_SIZE", "10"))
+# How long a replaced client stays open for in-flight operations
+DRAIN_SECONDS = float(os.getenv("MONGO_DRAIN_SECONDS", "10"))
+
+
+def workload_options():
+    catalog = {
+        "read_preference": SecondaryPreferred(max_staleness=MAX_STALENESS_SECONDS),
+        "read_concern": ReadConcern("local"),
+        "write_concern": WriteConcern(w=1),
+    }
+    # Catalog reads that must see a recent write (cache refills right after one, existence checks)
+    catalog_primary = {
+        "read_preference": Primary(),
+        "read_concern": ReadConcern("local"),
+        "write_concern": WriteConcern(w=1),
+    }
+    transactional = {
+        "read_preference": Primary(),
+        "read_concern": ReadConcern("majority"),
+        "write_concern": WriteConcern(w="majority"),
+    }
+    return {
+        "catalog": catalog,
+        "reviews": catalog,
+        "catalog_primary": catalog_primary,
+        "orders": transactional,
+        "auth": transactional,
+    }
+
+
+class CommandStats(monitoring.CommandListener):
+    """Per-node command counts and latency, showing how reads spread over the replica set."""
+
+    def __init__(self):
+        self.nodes = {}
+
+    def _node(self, event):
+        host, port = event.connection_id
+        key = f"{host}:{port}"
+        if key not in self.nodes:
+            self.nodes[key] = {"commands": 0, "failures": 0, "totalMs": 0.0, "maxMs": 0.0}
+        return self.nodes[key]
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        node = self._node(event)
+        ms = event.duration_micros / 1000
+        node["commands"] += 1
+        node["totalMs"] += ms
+        node["maxMs"] = max(node["maxMs"], ms)
+
+    def failed(self, event):
+        node = self._node(event)
+        node["commands"] += 1
+        node["failures"] += 1
+        node["totalMs"] += event.duration_micros / 1000
+
+    def snapshot(self):
+        return {
+            key: {**node, "avgMs": round(node["totalMs"] / node["commands"], 3) if node["commands"] else 0.0}
+            for key, node in self.nodes.items()
+        }
+
+
+def mode_uri(mode):
+    if mode == "replica":
+        return os.getenv("MONGO_URI_REPLICA", "mongodb://localhost:27017,localhost:27018,localhost:27019/favcart?replicaSet=rs0")
+    return os.getenv("MONGO_URI_STANDALONE", "mongodb://localhost:27017/favcart")
+
+
+class Connection:
+    """A client plus its default and workload handles, swapped as one unit on failover."""
+
+    def __init__(self, mode, client):
+        self.mode = mode
+        self.client = client
+        self.db = client.get_default_database()
+        self.handles = {
+            name: client.get_database(self.db.name, **options)
+            for name, options in workload_options().items()
+        }
+
+
 class DatabaseManager:
     def __init__(self):
         self.client = None
         self.db = None
+        self.handles = {}
+        self.handle_usage = {}
+        self.command_stats = CommandStats()
+        # Extra pymongo listeners (e.g. metrics) applied to every client created from now on
+        self.event_listeners = [self.command_stats]
         self.mode = "standalone"
+        # Set by the health monitor while secondaries lag: catalog reads go to the primary
+        self.primary_reads = False
+        self.standby = None
+        self.standby_task = None
         self.logger = logging.getLogger("DatabaseManager")
         logging.basicConfig(level=logging.INFO)
 
+    async def _open(self, mode, min_pool_size=0):
+        client = AsyncIOMotorClient(
+            mode_uri(mode),
+            serverSelectionTimeoutMS=5000,
+            minPoolSize=min_pool_size,
+            event_listeners=self.event_listeners
+        )
+        try:
+            # Verify connection
+            await client.admin.command('ping')
+        except Exception:
+            client.close()
+            raise
+        return Connection(mode, client)
+
+    def _activate(self, conn):
+        # No awaits in here: requests see either the old connection or the new one, never a mix
+        previous = self.client
+        self.client = conn.client
+        self.db = conn.db
+        self.handles = conn.handles
+        self.mode = conn.mode
+        return previous
+
+    async def _drain_and_close(self, client):
+        # Requests that already hold the old handles get time to finish before the pool goes away
+        await asyncio.sleep(DRAIN_SECONDS)
+        client.close()
+        self.logger.info("Previous database client drained and closed.")
+
     async def connect(self, mode=None):
         if mode is None:
             mode = os.getenv("MONGO_DEFAULT_MODE", "replica")
-            
-        self.mode = mode
-        
-        # Select URI based on mode
+
         if mode == "replica":
-            uri = os.getenv("MONGO_URI_REPLICA", "mongodb://localhost:27017,localhost:27018,localhost:27019/favcart?replicaSet=rs0")
             self.logger.info("Connecting to Replica Set...")
         else:
-            uri = os.getenv("MONGO_URI_STANDALONE", "mongodb://localhost:27017/favcart")
             self.logger.info("Connecting to Standalone Backup...")
 
         try:
-            self.client = AsyncIOMotorClient(uri, serverSelectionTimeoutMS=5000)
-            self.db = self.client.get_default_database()
-            
-            # Verify connection
-            await self.client.admin.command('ping')
-            self.logger.info(f"Successfully connected to MongoDB in {mode} mode.")
-            
+            conn = await self._open(mode)
         except Exception as e:
             self.logger.error(f"Failed to connect to database in {mode} mode: {e}")
             # Simple failover logic
             if mode == "replica":
                 self.logger.warning("Replica Set failed. Switching to Standalone...")
                 await self.connect("standalone")
+                return
             else:
                 self.logger.critical("All database connections failed.")
                 raise e
 
+        previous = self._activate(conn)
+        if previous is not None:
+            asyncio.create_task(self._drain_and_close(previous))
+        self.logger.info(f"Successfully connected to MongoDB in {mode} mode.")
+        self.schedule_standby()
+
+    def schedule_standby(self):
+        if self.standby_task is None or self.standby_task.done():
+            self.standby_task = asyncio.create_task(self._prepare_standby())
+
+    async def _prepare_standby(self):
+        """Keep a pinged client with a warm pool ready for the mode we are not in."""
+        target = "standalone" if self.mode == "replica" else "replica"
+        if self.standby is not None and self.standby.mode == target:
+            return
+        if self.standby is not None:
+            self.standby.client.close()
+            self.standby = None
+
+        try:
+            conn = await self._open(target, min_pool_size=STANDBY_POOL_SIZE)
+        except Exception as e:
+            self.logger.warning(f"Standby client for {target} mode unavailable: {e}")
+            return
+
+        try:
+            # Open pool connections now rather than on the first requests after a switch
+            await asyncio.gather(*[conn.client.admin.command('ping') for _ in range(STANDBY_POOL_SIZE)])
+        except Exception as e:
+            self.logger.warning(f"Standby client for {target} mode failed to warm up: {e}")
+            conn.client.close()
+            return
+
+        self.standby = conn
+        self.logger.info(f"Standby client ready in {target} mode.")
+
+    async def failover(self, mode):
+        """Switch to `mode`, using the warm standby when it is ready."""
+        if mode == self.mode and self.client is not None:
+            return
+
+        conn = self.standby if self.standby is not None and self.standby.mode == mode else None
+        if conn is not None:
+            self.standby = None
+            try:
+                await conn.client.admin.command('ping')
+            except Exception as e:
+                self.logger.warning(f"Standby client failed its final check: {e}")
+                conn.client.close()
+                conn = None
+
+        if conn is None:
+            # No usable standby, fall back to a cold connect
+            await self.connect(mode)
+            return
+
+        previous = self._activate(conn)
+        self.logger.warning(f"Failed over to {mode} mode using warm standby.")
+        if previous is not None:
+            asyncio.create_task(self._drain_and_close(previous))
+        self.schedule_standby()
+
     async def disconnect(self):
+        if self.standby_task is not None:
+            self.standby_task.cancel()
+        if self.standby is not None:
+            self.standby.client.close()
+            self.standby = None
         if self.client:
             self.client.close()
             self.logger.info("Database disconnected.")
 
-    def get_db(self):
-        return self.db
+    def get_db(self, workload=None):
+        """Return the default handle, or the one tuned for `workload` (catalog, reviews, catalog_primary, orders, auth)."""
+        if workload is None or self.db is None:
+            return self.db
+        if self.primary_reads and workload in ("catalog", "reviews"):
+            workload = "catalog_primary"
+        self.handle_usage[workload] = self.handle_usage.get(workload, 0) + 1
+        return self.handles.get(workload, self.db)
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "standby": self.standby.mode if self.standby is not None else None,
+            "handles": self.handle_usage,
+            "nodes": self.command_stats.snapshot(),
+        }
 
 # Create a global instance
 db_manager = DatabaseManager()
-
@@ -0,0 +1,53 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from utils.search import TEXT_INDEX
+from utils.reviews import REVIEW_INDEXES
+from utils.revocation import REVOCATION_INDEXES
+from utils.rate_limit import RATE_LIMIT_INDEXES
+from utils.email import OUTBOX_INDEXES
+
+logger = logging.getLogger("Indexes")
+
+# Every index the routers rely on, by collection. Names are fixed so re-running is a no-op.
+INDEXES = {
+    "users": [
+        # login / register / forgot_password lookups, and no duplicate accounts
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        # reset_password; sparse because almost no user has a pending token
+        IndexModel([("resetPasswordToken", ASCENDING), ("resetPasswordExpire", ASCENDING)],
+                   sparse=True, name="reset_token"),
+    ],
+    "orders": [
+        # my_orders
+        IndexModel([("user", ASCENDING), ("createdAt", DESCENDING)], name="user_created"),
+        # Idempotency-Key on new_order: a retried checkout finds the first attempt's order
+        IndexModel([("user", ASCENDING), ("idempotencyKey", ASCENDING)], unique=True,
+                   partialFilterExpression={"idempotencyKey": {"$exists": True}}, name="user_idempotency_key"),
+    ],
+    "products": [
+        TEXT_INDEX,
+        # filter_products: category with price range or minimum rating
+        IndexModel([("category", ASCENDING), ("price", ASCENDING)], name="category_price"),
+        IndexModel([("category", ASCENDING), ("ratings", DESCENDING)], name="category_ratings"),
+        # Price/ratings filters without a category, and keyset pagination on those keys
+        IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price_id"),
+        IndexModel([("ratings", ASCENDING), ("_id", ASCENDING)], name="ratings_id"),
+        IndexModel([("createdAt", ASCENDING), ("_id", ASCENDING)], name="created_id"),
+    ],
+    "reviews": REVIEW_INDEXES,
+    "revoked_tokens": REVOCATION_INDEXES,
+    "rate_limits": RATE_LIMIT_INDEXES,
+    "email_outbox": OUTBOX_INDEXES,
+}
+
+
+async def ensure_indexes(db):
+    """Create any missing indexes; existing ones with the same spec are left alone."""
+    for collection, models in INDEXES.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # e.g. duplicate emails blocking the unique index; keep serving and report it
+            logger.error(f"Could not ensure indexes on {collection}: {e}")
+    logger.info("Indexes ensured.")
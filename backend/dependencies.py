@@ -2,6 +2,7 @@ from fastapi import Request, HTTPException, Depends
 from utils.jwt import decode_access_token
 from config.database import db_manager
 from bson import ObjectId
+from utils.cache import user_cache
 
 async def get_current_user(request: Request):
     token = request.cookies.get("token")
@@ -12,10 +13,19 @@ async def get_current_user(request: Request):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    db = db_manager.get_db()
-    user = await db.users.find_one({"_id": ObjectId(payload.get("id"))})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-        
-    user["_id"] = str(user["_id"])
-    return user
+    user_id = payload.get("id")
+    user = user_cache.get(user_id)
+    if user is None:
+        db = db_manager.get_db("auth")
+        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+
+        user["_id"] = str(user["_id"])
+        # Evictions only reach this worker, so admins are re-read on every request:
+        # a demotion made elsewhere takes effect at once instead of after the TTL
+        if user.get("role") != "admin":
+            user_cache.set(user_id, user)
+
+    # Handlers may modify the user they get, so never hand out the cached dict
+    return dict(user)
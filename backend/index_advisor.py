@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import hashlib
+from datetime import datetime
+from bson import ObjectId
+from config.database import db_manager
+from config.indexes import ensure_indexes
+
+# The query shapes each router sends, with placeholder values
+ROUTER_QUERIES = [
+    ("auth.login / register", "users", {"email": "someone@example.com"}, None),
+    ("auth.reset_password", "users", {
+        "resetPasswordToken": hashlib.sha256(b"token").hexdigest(),
+        "resetPasswordExpire": {"$gt": datetime.utcnow()},
+    }, None),
+    ("order.my_orders", "orders", {"user": str(ObjectId())}, None),
+    ("order.new_order (Idempotency-Key)", "orders", {"user": str(ObjectId()), "idempotencyKey": "key"}, None),
+    ("product.get_products (category)", "products", {"category": "Laptops"}, None),
+    ("product.get_products (category + price)", "products",
+     {"category": "Laptops", "price": {"$gte": 100.0, "$lte": 500.0}}, None),
+    ("product.get_products (price)", "products", {"price": {"$gte": 100.0, "$lte": 500.0}}, None),
+    ("product.get_products (ratings)", "products", {"ratings": {"$gte": 4.0}}, None),
+    ("product.get_products (keyword)", "products", {"$text": {"$search": "laptop"}}, None),
+    ("product.get_products (sort=price)", "products", {}, {"price": 1, "_id": 1}),
+    ("product.get_product_reviews", "reviews", {"product": ObjectId()}, {"_id": 1}),
+]
+
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree."""
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+async def explain_queries(db):
+    print("Router query plans:")
+    scans = 0
+    for label, collection, query, sort in ROUTER_QUERIES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = sort
+        try:
+            result = await db.command("explain", command, verbosity="queryPlanner")
+        except Exception as e:
+            print(f"  ?        {label:<42} explain failed: {e}")
+            continue
+
+        stages = list(dict.fromkeys(plan_stages(result["queryPlanner"]["winningPlan"])))
+        if "COLLSCAN" in stages:
+            scans += 1
+            status = "COLLSCAN"
+        else:
+            status = "ok"
+        print(f"  {status:<8} {label:<42} {' > '.join(s for s in stages if s)}")
+    return scans
+
+
+async def sample_profiler(db, limit):
+    # Needs profiling enabled, e.g. db.setProfilingLevel(1, {slowms: 50})
+    pipeline = [
+        {"$match": {"planSummary": "COLLSCAN"}},
+        {"$group": {
+            "_id": {"ns": "$ns", "op": "$op", "filter": {"$objectToArray": {"$ifNull": ["$command.filter", {}]}}},
+            "count": {"$sum": 1},
+            "avgMillis": {"$avg": "$millis"},
+        }},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    rows = await db.system.profile.aggregate(pipeline).to_list(length=limit)
+    print("\nProfiled collection scans:")
+    if not rows:
+        print("  none recorded (is the profiler enabled?)")
+    for row in rows:
+        fields = ", ".join(sorted(f["k"] for f in row["_id"]["filter"])) or "<no filter>"
+        print(f"  {row['count']:6d}x {row['_id']['ns']:<28} {row['_id']['op']:<8} "
+              f"fields: {fields}  avg {row['avgMillis']:.1f}ms")
+    return len(rows)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Report router queries that still do COLLSCAN.")
+    parser.add_argument("--ensure", action="store_true", help="create the declared indexes first")
+    parser.add_argument("--profile", action="store_true", help="also summarise COLLSCANs in system.profile")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    await db_manager.connect()
+    db = db_manager.get_db()
+
+    if args.ensure:
+        await ensure_indexes(db)
+
+    scans = await explain_queries(db)
+    if args.profile:
+        scans += await sample_profiler(db, args.limit)
+
+    await db_manager.disconnect()
+    return 1 if scans else 0
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
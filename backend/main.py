@@ -1,13 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, Response
 import asyncio
 from config.database import db_manager
-from utils.health_monitor import monitor_health
+from utils.health_monitor import monitor_health, health_state
+from utils.cache import watch_catalog_changes, cache_stats, catalog_state
+from config.indexes import ensure_indexes
+from utils.password import shutdown_pool
+from utils.images import shutdown_image_pool
+from utils.static import ImmutableStaticFiles
+from utils.email import email_dispatcher
+from utils.payment_gateway import payment_gateway
+from utils.journal import journal_stats
+from utils.revocation import sync_revocations, revocation_stats
+from utils.rate_limit import admission_control, monitor_loop_lag, admission_stats
+from utils import metrics
+from utils.responses import BSONResponse
+import time
 from routers import product, auth, order, payment
 import os
 
-app = FastAPI(title="FavCart API", version="2.0")
+app = FastAPI(title="FavCart API", version="2.0", default_response_class=BSONResponse)
+
+# Rate limits and load shedding; registered first so CORS and metrics wrap its 429/503s
+app.middleware("http")(admission_control)
 
 # CORS (Allow Frontend to connect)
 app.add_middleware(
@@ -18,10 +34,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request metrics
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    metrics.http_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.http_latency.observe(path, request.method, value=time.perf_counter() - start)
+        metrics.http_requests.inc(path, request.method, status)
+        metrics.http_in_flight.inc(amount=-1)
+
+# Health and cache readings, sampled at scrape time
+metrics.registry.register(metrics.Gauge(
+    "mongodb_uptime_seconds", "Uptime reported by the active MongoDB server.",
+    func=lambda: {(): health_state["uptime"]}))
+metrics.registry.register(metrics.Gauge(
+    "host_cpu_temperature_celsius", "CPU temperature read by the health monitor.",
+    func=lambda: {(): health_state["temperature"]}))
+metrics.registry.register(metrics.Gauge(
+    "mongodb_replica_max_lag_seconds", "Largest secondary replication lag.",
+    func=lambda: {(): health_state["maxLagSeconds"]}))
+metrics.registry.register(metrics.Gauge(
+    "mongodb_mode", "Active database mode (1 for the current one).", ("mode",),
+    func=lambda: {("replica",): int(db_manager.mode == "replica"), ("standalone",): int(db_manager.mode == "standalone")}))
+metrics.registry.register(metrics.Gauge(
+    "event_loop_lag_seconds", "Event loop wake-up delay, as seen by the load shedder.",
+    func=lambda: {(): admission_stats["loopLag"]}))
+metrics.registry.register(metrics.Gauge(
+    "cache_lookups", "Cache hits and misses per cache.", ("cache", "result"),
+    func=lambda: {(name, result): s[result] for name, s in cache_stats().items() for result in ("hits", "misses")}))
+
 # Mount static files
 if not os.path.exists("uploads"):
     os.makedirs("uploads")
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", ImmutableStaticFiles(directory="uploads"), name="uploads")
 
 # Include Routers
 app.include_router(product.router, prefix="/api/v1")
@@ -31,17 +85,61 @@ app.include_router(payment.router, prefix="/api/v1")
 
 @app.on_event("startup")
 async def startup_db_client():
+    # Command, pool and checkout-wait metrics for every client the manager creates
+    db_manager.event_listeners.extend(metrics.mongo_listeners())
+
     # Connect to DB (Default to Replica, fallback handled in class)
     await db_manager.connect("replica")
+
+    # Create the indexes the routers rely on (no-op when they already exist)
+    await ensure_indexes(db_manager.get_db())
     
     # Start Health Monitor in background
     asyncio.create_task(monitor_health())
 
+    # Keep catalog caches consistent across workers (replica mode only)
+    asyncio.create_task(watch_catalog_changes())
+
+    # Mirror revoked tokens into memory so auth checks never hit the database
+    asyncio.create_task(sync_revocations())
+
+    # Event loop lag feeds the load shedder
+    asyncio.create_task(monitor_loop_lag())
+
+    # Deliver queued mail (including anything left in the outbox) in the background
+    await email_dispatcher.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await email_dispatcher.stop()
+    await payment_gateway.close()
     await db_manager.disconnect()
+    shutdown_pool()
+    shutdown_image_pool()
 
 @app.get("/")
 async def root():
     return {"message": "FavCart API is running (FastAPI Version)"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/health/ready")
+async def health_ready():
+    # For the load balancer: ready whenever some database is serving, in either mode
+    ready = db_manager.get_db() is not None
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={**health_state, "ready": ready, "mode": db_manager.mode}
+    )
+
+@app.get("/db/stats")
+async def get_db_stats():
+    return {"success": True, "database": db_manager.stats(), "journal": journal_stats, "admission": admission_stats}
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {"success": True, "caches": cache_stats(), "catalogVersion": catalog_state["version"],
+            "revocations": revocation_stats}
+
@@ -0,0 +1,115 @@
+import asyncio
+from bson import ObjectId
+from pymongo import UpdateOne
+from config.database import db_manager
+from utils.reviews import ensure_review_indexes
+
+BATCH_SIZE = 500
+
+
+def as_object_id(user):
+    # Embedded reviews may hold the user id as a string; upsert_review keys on ObjectId
+    try:
+        return ObjectId(user)
+    except Exception:
+        return user
+
+
+async def recompute_ratings(db, product_id, extra=None):
+    stats = await db.reviews.aggregate([
+        {"$match": {"product": product_id}},
+        {"$group": {"_id": None, "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}}
+    ]).to_list(length=1)
+    rating_sum = stats[0]["sum"] if stats else 0
+    count = stats[0]["count"] if stats else 0
+
+    await db.products.update_one(
+        {"_id": product_id},
+        {"$set": {
+            **(extra or {}),
+            "ratingSum": rating_sum,
+            "numOfReviews": count,
+            "ratings": rating_sum / count if count else 0
+        }}
+    )
+
+
+async def normalize_review_users(db):
+    """Fix reviews an earlier run stored with a string user id. Returns the products touched."""
+    touched = set()
+    async for review in db.reviews.find({"user": {"$type": "string"}}, {"product": 1, "user": 1}):
+        user_id = as_object_id(review["user"])
+        if not isinstance(user_id, ObjectId):
+            continue
+        if await db.reviews.find_one({"product": review["product"], "user": user_id}, {"_id": 1}):
+            # The user has reviewed again since; that review wins
+            await db.reviews.delete_one({"_id": review["_id"]})
+        else:
+            await db.reviews.update_one({"_id": review["_id"]}, {"$set": {"user": user_id}})
+        touched.add(review["product"])
+    return touched
+
+
+async def migrate_reviews():
+    """Move embedded product reviews into the reviews collection.
+
+    Safe to re-run: reviews keep their original _id and are upserted, and the
+    product aggregates are recomputed from the reviews collection each time.
+    User ids are stored as ObjectId, as upsert_review expects; reviews an
+    earlier run stored with string ids are converted (or dropped if the user
+    has reviewed again since).
+    """
+    await db_manager.connect()
+    db = db_manager.get_db()
+    await ensure_review_indexes(db)
+
+    products_cursor = db.products.find(
+        {"reviews.0": {"$exists": True}},
+        {"reviews": 1}
+    )
+
+    migrated_products = 0
+    migrated_reviews = 0
+    async for product in products_cursor:
+        ops = []
+        # Older code let a user end up with two entries; the last one wins
+        latest_by_user = {}
+        for review in product["reviews"]:
+            latest_by_user[str(review.get("user"))] = review
+
+        for review in latest_by_user.values():
+            review_id = review.get("_id")
+            user_id = as_object_id(review["user"])
+            doc = {
+                "product": product["_id"],
+                "user": user_id,
+                "name": review.get("name", ""),
+                "rating": float(review["rating"]),
+                "comment": review.get("comment", ""),
+            }
+            ops.append(UpdateOne(
+                {"product": product["_id"], "user": user_id},
+                {"$set": doc, "$setOnInsert": {"_id": review_id}} if review_id else {"$set": doc},
+                upsert=True
+            ))
+            if len(ops) >= BATCH_SIZE:
+                await db.reviews.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await db.reviews.bulk_write(ops, ordered=False)
+
+        await recompute_ratings(db, product["_id"], {"reviews": []})
+        migrated_products += 1
+        migrated_reviews += len(latest_by_user)
+
+    print(f"Migrated {migrated_reviews} reviews from {migrated_products} products.")
+
+    touched = await normalize_review_users(db)
+    for product_id in touched:
+        await recompute_ratings(db, product_id)
+    if touched:
+        print(f"Normalized string user ids on reviews of {len(touched)} products.")
+    await db_manager.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(migrate_reviews())
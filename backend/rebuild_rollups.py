@@ -0,0 +1,17 @@
+import asyncio
+from config.database import db_manager
+from utils.rollups import rebuild_rollups, get_total
+
+async def main():
+    await db_manager.connect()
+    db = db_manager.get_db()
+
+    print("Rebuilding sales rollups from orders...")
+    await rebuild_rollups(db)
+
+    total = await get_total(db)
+    print(f"Done: {total['orders']} orders, revenue {total['revenue']:.2f}")
+    await db_manager.disconnect()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Response, Request, Body
 from config.database import db_manager
 from models.user import User
-from utils.jwt import create_access_token
-from passlib.context import CryptContext
+from utils.jwt import create_access_token, decode_access_token, ACCESS_TOKEN_MAX_AGE
 from bson import ObjectId
 from typing import List, Optional
 from dependencies import get_current_user
@@ -10,50 +9,53 @@ import secrets
 import hashlib
 from datetime import datetime, timedelta
 from utils.email import send_email
+from utils.cache import invalidate_user
+from utils.password import get_password_hash, verify_password
+from utils.export import export_collection
+from utils.journal import record_write, record_delete
+from utils.responses import BSONResponse
+from utils.revocation import revoke_token, revoke_all_for_user
 import os
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
 
 @router.post("/register", status_code=201)
-async def register(user: User, response: Response):
-    db = db_manager.get_db()
+async def register(user: User):
+    db = db_manager.get_db("auth")
     if await db.users.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    user.password = get_password_hash(user.password)
+    user.password = await get_password_hash(user.password)
     new_user = await db.users.insert_one(user.dict(exclude_none=True))
+    await record_write(db, "users", new_user.inserted_id)
     
     token = create_access_token({"id": str(new_user.inserted_id)})
+    response = BSONResponse({"success": True, "user": user.dict(), "token": token}, status_code=201)
     response.set_cookie(key="token", value=token, httponly=True)
-    
-    return {"success": True, "user": user.dict(), "token": token}
+    return response
 
 @router.post("/login")
-async def login(credentials: dict, response: Response):
+async def login(credentials: dict):
     email = credentials.get("email")
     password = credentials.get("password")
     
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     user = await db.users.find_one({"email": email})
     
-    if not user or not verify_password(password, user["password"]):
+    if not user or not await verify_password(password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     token = create_access_token({"id": str(user["_id"])})
+    response = BSONResponse({"success": True, "user": user, "token": token})
     response.set_cookie(key="token", value=token, httponly=True)
-    
-    user["_id"] = str(user["_id"])
-    return {"success": True, "user": user, "token": token}
+    return response
 
 @router.get("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    # Deleting the cookie is not enough: a copied token would stay valid until it expires
+    payload = decode_access_token(request.cookies.get("token", ""))
+    if payload:
+        await revoke_token(payload)
     response.delete_cookie("token")
     return {"success": True, "message": "Logged out"}
 
@@ -67,15 +69,16 @@ async def update_profile(
     email: str = Body(...), 
     current_user: dict = Depends(get_current_user)
 ):
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     new_data = {"name": name, "email": email}
     
     await db.users.update_one({"_id": ObjectId(current_user["_id"])}, {"$set": new_data})
+    await record_write(db, "users", ObjectId(current_user["_id"]))
+    invalidate_user(current_user["_id"])
     
     updated_user = await db.users.find_one({"_id": ObjectId(current_user["_id"])})
-    updated_user["_id"] = str(updated_user["_id"])
     
-    return {"success": True, "user": updated_user}
+    return BSONResponse({"success": True, "user": updated_user})
 
 @router.put("/password/change")
 async def change_password(
@@ -83,20 +86,27 @@ async def change_password(
     password: str = Body(...),
     current_user: dict = Depends(get_current_user)
 ):
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     user = await db.users.find_one({"_id": ObjectId(current_user["_id"])})
     
-    if not verify_password(oldPassword, user["password"]):
+    if not await verify_password(oldPassword, user["password"]):
         raise HTTPException(status_code=401, detail="Old password is incorrect")
         
-    new_hash = get_password_hash(password)
+    new_hash = await get_password_hash(password)
     await db.users.update_one({"_id": ObjectId(current_user["_id"])}, {"$set": {"password": new_hash}})
-    
-    return {"success": True, "message": "Password updated"}
+    await record_write(db, "users", ObjectId(current_user["_id"]))
+    invalidate_user(current_user["_id"])
+
+    # Sign out every other session, then keep this one with a fresh token
+    await revoke_all_for_user(current_user["_id"], ACCESS_TOKEN_MAX_AGE)
+    token = create_access_token({"id": current_user["_id"]})
+    response = BSONResponse({"success": True, "message": "Password updated"})
+    response.set_cookie(key="token", value=token, httponly=True)
+    return response
 
 @router.post("/password/forgot")
 async def forgot_password(email: str = Body(..., embed=True)):
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     user = await db.users.find_one({"email": email})
     
     if not user:
@@ -114,6 +124,7 @@ async def forgot_password(email: str = Body(..., embed=True)):
             "resetPasswordExpire": reset_password_expire
         }}
     )
+    await record_write(db, "users", user["_id"])
     
     reset_url = f"{os.getenv('FRONTEND_URL', 'http://localhost:3000')}/password/reset/{reset_token}"
     message = f"Your password reset token is as follow:\n\n{reset_url}\n\nIf you have not requested this email, then ignore it."
@@ -126,6 +137,7 @@ async def forgot_password(email: str = Body(..., embed=True)):
             {"_id": user["_id"]},
             {"$unset": {"resetPasswordToken": "", "resetPasswordExpire": ""}}
         )
+        await record_write(db, "users", user["_id"])
         raise HTTPException(status_code=500, detail="Email could not be sent")
 
 @router.post("/password/reset/{token}")
@@ -135,7 +147,7 @@ async def reset_password(token: str, password: str = Body(..., embed=True), conf
         
     reset_token_hash = hashlib.sha256(token.encode()).hexdigest()
     
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     user = await db.users.find_one({
         "resetPasswordToken": reset_token_hash,
         "resetPasswordExpire": {"$gt": datetime.utcnow()}
@@ -144,7 +156,7 @@ async def reset_password(token: str, password: str = Body(..., embed=True), conf
     if not user:
         raise HTTPException(status_code=400, detail="Password reset token is invalid or has expired")
         
-    new_hash = get_password_hash(password)
+    new_hash = await get_password_hash(password)
     
     await db.users.update_one(
         {"_id": user["_id"]},
@@ -153,6 +165,9 @@ async def reset_password(token: str, password: str = Body(..., embed=True), conf
             "$unset": {"resetPasswordToken": "", "resetPasswordExpire": ""}
         }
     )
+    await record_write(db, "users", user["_id"])
+    invalidate_user(user["_id"])
+    await revoke_all_for_user(user["_id"], ACCESS_TOKEN_MAX_AGE)
     
     # Auto login? Or just success? Frontend usually redirects to login.
     # But let's return a token just in case, or just success.
@@ -176,21 +191,28 @@ async def get_all_users(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     users_cursor = db.users.find({})
     users = await users_cursor.to_list(length=1000)
-    
-    for u in users:
-        u["_id"] = str(u["_id"])
         
-    return {"success": True, "users": users}
+    return BSONResponse({"success": True, "users": users})
+
+@router.get("/admin/users/export")
+async def export_users(format: str = "ndjson", after: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    db = db_manager.get_db("auth")
+    # Never export password hashes or reset tokens
+    fields = ["_id", "name", "email", "role", "avatar", "createdAt"]
+    return export_collection(db.users, fields, format, after, filename="users")
 
 @router.get("/admin/user/{id}")
 async def get_user(id: str, current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     try:
         obj_id = ObjectId(id)
     except:
@@ -200,16 +222,18 @@ async def get_user(id: str, current_user: dict = Depends(get_current_user)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    user["_id"] = str(user["_id"])
-    return {"success": True, "user": user}
+    return BSONResponse({"success": True, "user": user})
 
 @router.delete("/admin/user/{id}")
 async def delete_user(id: str, current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     await db.users.delete_one({"_id": ObjectId(id)})
+    await record_delete(db, "users", ObjectId(id))
+    invalidate_user(id)
+    await revoke_all_for_user(id, ACCESS_TOKEN_MAX_AGE)
     return {"success": True, "message": "User deleted"}
 
 @router.put("/admin/user/{id}")
@@ -217,8 +241,10 @@ async def update_user(id: str, role: str = Body(...), name: str = Body(...), ema
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("auth")
     await db.users.update_one({"_id": ObjectId(id)}, {"$set": {"name": name, "email": email, "role": role}})
+    await record_write(db, "users", ObjectId(id))
+    invalidate_user(id)
     return {"success": True, "message": "User updated"}
 
 
@@ -1,28 +1,45 @@
-from fastapi import APIRouter, HTTPException, Request, Depends, Body
+from fastapi import APIRouter, HTTPException, Request, Depends, Body, Header
 from config.database import db_manager
 from models.order import Order
 from bson import ObjectId
+from pymongo import ReturnDocument
 from dependencies import get_current_user
 from datetime import datetime
+from typing import Optional
+from utils.export import export_collection
+from utils.rollups import record_order, record_status_change, get_total
+from utils.journal import record_write, record_delete
+from utils.responses import BSONResponse
+from utils.fields import parse_fields, ORDER_FIELDS, ORDER_VIEWS
+from utils.orders import place_order, release_order_stock
+from utils.cache import invalidate_products
 
 router = APIRouter()
 
 @router.post("/order/new")
-async def new_order(order: Order, current_user: dict = Depends(get_current_user)):
-    db = db_manager.get_db()
-    order_dict = order.dict()
-    order_dict["user"] = current_user["_id"]
-    order_dict["paidAt"] = datetime.now()
-    
-    new_order = await db.orders.insert_one(order_dict)
-    created_order = await db.orders.find_one({"_id": new_order.inserted_id})
-    created_order["_id"] = str(created_order["_id"])
-    
-    return {"success": True, "order": created_order}
+async def new_order(
+    order: Order,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=200),
+    current_user: dict = Depends(get_current_user)
+):
+    db = db_manager.get_db("orders")
+    # Prices come from the catalog and stock is reserved atomically; the client's totals are ignored
+    placed, created = await place_order(db, order, current_user["_id"], idempotency_key)
+    if created:
+        product_ids = [ObjectId(item["product"]) for item in placed["orderItems"]]
+        await record_write(db, "orders", placed["_id"])
+        await record_write(db, "products", *product_ids)
+        await record_order(db, placed)
+        invalidate_products(*product_ids)
+
+    response = BSONResponse({"success": True, "order": placed})
+    if not created:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response
 
 @router.get("/order/{id}")
 async def get_order(id: str, current_user: dict = Depends(get_current_user)):
-    db = db_manager.get_db()
+    db = db_manager.get_db("orders")
     try:
         obj_id = ObjectId(id)
     except:
@@ -32,61 +49,71 @@ async def get_order(id: str, current_user: dict = Depends(get_current_user)):
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
-    order["_id"] = str(order["_id"])
-    return {"success": True, "order": order}
+    return BSONResponse({"success": True, "order": order})
 
 @router.get("/myorders")
-async def my_orders(current_user: dict = Depends(get_current_user)):
-    db = db_manager.get_db()
-    orders_cursor = db.orders.find({"user": current_user["_id"]})
+async def my_orders(fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    db = db_manager.get_db("orders")
+    orders_cursor = db.orders.find({"user": current_user["_id"]}, parse_fields(fields, ORDER_FIELDS, ORDER_VIEWS))
     orders = await orders_cursor.to_list(length=1000)
-    
-    for o in orders:
-        o["_id"] = str(o["_id"])
         
-    return {"success": True, "orders": orders}
+    return BSONResponse({"success": True, "orders": orders})
 
 # --- Admin Routes ---
 
 @router.get("/admin/orders")
-async def admin_orders(current_user: dict = Depends(get_current_user)):
+async def admin_orders(fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
-    orders_cursor = db.orders.find({})
+    db = db_manager.get_db("orders")
+    orders_cursor = db.orders.find({}, parse_fields(fields, ORDER_FIELDS, ORDER_VIEWS))
     orders = await orders_cursor.to_list(length=1000)
     
-    total_amount = sum(o.get("totalPrice", 0) for o in orders)
-    
-    for o in orders:
-        o["_id"] = str(o["_id"])
+    # O(1) read from the rollups instead of summing (at most 1000) orders here
+    total_amount = (await get_total(db))["revenue"]
         
-    return {"success": True, "orders": orders, "totalAmount": total_amount}
+    return BSONResponse({"success": True, "orders": orders, "totalAmount": total_amount})
+
+@router.get("/admin/orders/export")
+async def export_orders(format: str = "ndjson", after: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    db = db_manager.get_db("orders")
+    fields = ["_id", "user", "orderStatus", "itemsPrice", "taxPrice", "shippingPrice",
+              "totalPrice", "paidAt", "deliveredAt", "createdAt"]
+    return export_collection(db.orders, fields, format, after, filename="orders")
 
 @router.put("/admin/order/{id}")
 async def update_order(id: str, orderStatus: str = Body(..., embed=True), current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("orders")
     try:
         obj_id = ObjectId(id)
     except:
         raise HTTPException(status_code=400, detail="Invalid ID")
 
-    order = await db.orders.find_one({"_id": obj_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-        
-    if order.get("orderStatus") == "Delivered":
-        raise HTTPException(status_code=400, detail="Order already delivered")
-        
     update_data = {"orderStatus": orderStatus}
     if orderStatus == "Delivered":
         update_data["deliveredAt"] = datetime.now()
-        
-    await db.orders.update_one({"_id": obj_id}, {"$set": update_data})
+
+    # Guard and update in one step, and move the rollups from the status this update
+    # actually replaced, so concurrent updates can't double-count or skip the guard
+    order = await db.orders.find_one_and_update(
+        {"_id": obj_id, "orderStatus": {"$ne": "Delivered"}},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not order:
+        if await db.orders.count_documents({"_id": obj_id}, limit=1):
+            raise HTTPException(status_code=400, detail="Order already delivered")
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    await record_write(db, "orders", obj_id)
+    await record_status_change(db, order, orderStatus)
     
     return {"success": True}
 
@@ -95,7 +122,14 @@ async def delete_order(id: str, current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Access denied")
         
-    db = db_manager.get_db()
-    await db.orders.delete_one({"_id": ObjectId(id)})
+    db = db_manager.get_db("orders")
+    order = await db.orders.find_one_and_delete({"_id": ObjectId(id)})
+    if order:
+        await record_delete(db, "orders", order["_id"])
+        await record_order(db, order, sign=-1)
+        restocked = await release_order_stock(db, order)
+        if restocked:
+            await record_write(db, "products", *restocked)
+            invalidate_products(*restocked)
     return {"success": True}
 
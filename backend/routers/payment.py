@@ -1,27 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi import APIRouter, HTTPException, Depends, Body, Header
 from config.database import db_manager
 from dependencies import get_current_user
+from utils.payment_gateway import payment_gateway, derive_idempotency_key, PaymentGatewayError
+from typing import Optional
 import os
-import stripe
+import time
 
 router = APIRouter()
 
-stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# Without an orderId or Idempotency-Key, same user + amount within this window is one payment
+PAYMENT_RETRY_WINDOW = int(os.getenv("PAYMENT_RETRY_WINDOW", "600"))
 
 @router.post("/payment/process")
-async def process_payment(amount: int = Body(..., embed=True), current_user: dict = Depends(get_current_user)):
+async def process_payment(
+    amount: int = Body(..., embed=True),
+    orderId: Optional[str] = Body(None, embed=True),
+    client_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=200),
+    current_user: dict = Depends(get_current_user)
+):
+    # Same order (or client key) + amount -> same key, so client retries never charge twice.
+    # Clients sending neither get a key from stable inputs instead of a random one
+    scope = orderId or client_key or f"window:{int(time.time() // PAYMENT_RETRY_WINDOW)}"
+    idempotency_key = derive_idempotency_key(current_user["_id"], scope, amount)
+
     try:
-        payment_intent = stripe.PaymentIntent.create(
+        payment_intent = await payment_gateway.create_payment_intent(
             amount=amount,
             currency="inr",
-            metadata={"integration_check": "accept_a_payment"}
+            metadata={"integration_check": "accept_a_payment"},
+            idempotency_key=idempotency_key
         )
-        return {"success": True, "client_secret": payment_intent.client_secret}
-    except Exception as e:
-        # For now, since we might not have valid keys, let's return a mock success if it fails, 
-        # or just raise error. But since frontend mocks it, this might not be called.
-        # If called and fails, it's better to know.
-        raise HTTPException(status_code=500, detail=str(e))
+        return {"success": True, "client_secret": payment_intent["client_secret"]}
+    except PaymentGatewayError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
 
 @router.get("/stripeapi")
 async def get_stripe_api_key(current_user: dict = Depends(get_current_user)):
@@ -1,17 +1,31 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, Body
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Request, UploadFile, File
 from config.database import db_manager
 from models.product import Product
 from typing import List, Optional
 from bson import ObjectId
 import math
 from dependencies import get_current_user
+from utils.cache import catalog_cache, catalog_list_key, catalog_product_key, invalidate_catalog, product_counts, catalog_db, write_stamp
+from utils.pagination import parse_sort, sort_spec, encode_cursor, keyset_filter
+from utils.search import keyword_filter, is_text_query, TEXT_SCORE
+from utils.reviews import upsert_review, remove_review, list_reviews
+from utils.export import export_collection
+from utils.journal import record_write, record_delete
+from utils.responses import BSONResponse
+from utils.fields import parse_fields, PRODUCT_FIELDS, PRODUCT_VIEWS
+from utils.http_cache import render, catalog_response
+from utils.images import store_image
+import os
 
 router = APIRouter()
 
+DEFAULT_RES_PER_PAGE = int(os.getenv("PRODUCTS_PER_PAGE", "4"))
+MAX_RES_PER_PAGE = 100
+
 # --- Helper for Search & Filter ---
 def filter_products(query, keyword, price_gte, price_lte, category, ratings):
     if keyword:
-        query["name"] = {"$regex": keyword, "$options": "i"}
+        query.update(keyword_filter(keyword))
     
     if price_gte or price_lte:
         query["price"] = {}
@@ -28,47 +42,86 @@ def filter_products(query, keyword, price_gte, price_lte, category, ratings):
     
     return query
 
-@router.get("/products", response_model=dict)
+@router.get("/products")
 async def get_products(
+    request: Request,
     keyword: Optional[str] = None,
     category: Optional[str] = None,
     price_gte: Optional[float] = Query(None, alias="price[gte]"),
     price_lte: Optional[float] = Query(None, alias="price[lte]"),
     ratings: Optional[float] = None,
-    page: int = 1
+    page: int = 1,
+    resPerPage: int = Query(DEFAULT_RES_PER_PAGE, ge=1, le=MAX_RES_PER_PAGE),
+    after: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None
 ):
-    db = db_manager.get_db()
+    db = catalog_db()
     if db is None:
         raise HTTPException(status_code=503, detail="Database unavailable")
         
     # Build Query
     query = {}
     query = filter_products(query, keyword, price_gte, price_lte, category, ratings)
-    
+    projection = parse_fields(fields, PRODUCT_FIELDS, PRODUCT_VIEWS)
+
+    cache_key = catalog_list_key(query, page, resPerPage, after, sort, fields)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        # Entries hold the rendered body and its ETag, so revalidations cost no database work
+        return catalog_response(request, *cached)
+
+    stamp = write_stamp()
     # Pagination
-    res_per_page = 4
-    skip = (page - 1) * res_per_page
-    
-    total_products = await db.products.count_documents(query)
-    
-    products_cursor = db.products.find(query).skip(skip).limit(res_per_page)
-    products = await products_cursor.to_list(length=res_per_page)
-    
-    # Convert ObjectId
-    for p in products:
-        p["_id"] = str(p["_id"])
+    res_per_page = resPerPage
+    total_products = await product_counts.get(db.products, query)
 
-    return {
+    next_cursor = None
+    cursor_mode = after is not None or sort is not None
+    if cursor_mode:
+        # Opt-in keyset mode: seek past the last seen (sort key, _id) instead of skipping
+        sort = sort or "_id"
+        field, direction = parse_sort(sort)
+        # The next cursor is built from the sort key, so it must be projected
+        projection[field] = 1
+        page_query = query
+        if after:
+            # Merge rather than $and so a $text clause stays at the top level
+            page_query = {**query, **keyset_filter(sort, after)}
+
+        products_cursor = db.products.find(page_query, projection).sort(sort_spec(field, direction)).limit(res_per_page + 1)
+        products = await products_cursor.to_list(length=res_per_page + 1)
+        if len(products) > res_per_page:
+            products = products[:res_per_page]
+            next_cursor = encode_cursor(sort, products[-1])
+    else:
+        skip = (page - 1) * res_per_page
+        if is_text_query(query):
+            # Rank search results by relevance
+            products_cursor = db.products.find(query, {**projection, **TEXT_SCORE}).sort([("score", TEXT_SCORE["score"])])
+        else:
+            products_cursor = db.products.find(query, projection)
+        products_cursor = products_cursor.skip(skip).limit(res_per_page)
+        products = await products_cursor.to_list(length=res_per_page)
+
+    result = {
         "success": True,
         "count": len(products),
         "productsCount": total_products,
         "resPerPage": res_per_page,
         "products": products
     }
+    if cursor_mode:
+        result["nextCursor"] = next_cursor
+    rendered = render(result)
+    if write_stamp() == stamp:
+        # Not when a write landed while this was built; it may predate the write
+        catalog_cache.set(cache_key, rendered)
+    return catalog_response(request, *rendered)
 
-@router.get("/product/{id}", response_model=dict)
-async def get_product(id: str):
-    db = db_manager.get_db()
+@router.get("/product/{id}")
+async def get_product(id: str, request: Request):
+    db = catalog_db(product_id=id)
     if db is None:
         raise HTTPException(status_code=503, detail="Database unavailable")
 
@@ -77,38 +130,55 @@ async def get_product(id: str):
     except:
         raise HTTPException(status_code=400, detail="Invalid ID format")
 
+    cache_key = catalog_product_key(id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return catalog_response(request, *cached)
+
+    stamp = write_stamp(id)
     product = await db.products.find_one({"_id": obj_id})
 
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    product["_id"] = str(product["_id"])
+    # Reviews live in their own collection; embed the first page for the detail view
+    product["reviews"], _ = await list_reviews(db, obj_id)
     
-    return {
+    result = {
         "success": True,
         "product": product
     }
+    rendered = render(result)
+    if write_stamp(id) == stamp:
+        catalog_cache.set(cache_key, rendered)
+    return catalog_response(request, *rendered)
 
 # --- Admin Routes ---
 
-@router.get("/admin/products", response_model=dict)
-async def get_admin_products(current_user: dict = Depends(get_current_user)):
+@router.get("/admin/products")
+async def get_admin_products(fields: Optional[str] = None, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
 
     db = db_manager.get_db()
-    products_cursor = db.products.find({})
+    products_cursor = db.products.find({}, parse_fields(fields, PRODUCT_FIELDS, PRODUCT_VIEWS))
     products = await products_cursor.to_list(length=1000)
-    
-    for p in products:
-        p["_id"] = str(p["_id"])
         
-    return {
+    return BSONResponse({
         "success": True,
         "products": products
-    }
+    })
 
-@router.post("/admin/product/new", response_model=dict)
+@router.get("/admin/products/export")
+async def export_products(format: str = "ndjson", after: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    db = db_manager.get_db("catalog")
+    fields = ["_id", "name", "price", "category", "seller", "stock", "ratings", "numOfReviews", "createdAt"]
+    return export_collection(db.products, fields, format, after, filename="products")
+
+@router.post("/admin/product/new")
 async def create_product(product: Product, current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -118,16 +188,16 @@ async def create_product(product: Product, current_user: dict = Depends(get_curr
     product_dict["user"] = ObjectId(current_user["_id"])
     
     new_product = await db.products.insert_one(product_dict)
+    await record_write(db, "products", new_product.inserted_id)
+    invalidate_catalog()
     created_product = await db.products.find_one({"_id": new_product.inserted_id})
-    created_product["_id"] = str(created_product["_id"])
-    created_product["user"] = str(created_product["user"])
     
-    return {
+    return BSONResponse({
         "success": True,
         "product": created_product
-    }
+    })
 
-@router.put("/admin/product/{id}", response_model=dict)
+@router.put("/admin/product/{id}")
 async def update_product(id: str, product_update: dict = Body(...), current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
@@ -143,19 +213,40 @@ async def update_product(id: str, product_update: dict = Body(...), current_user
         del product_update["_id"]
 
     result = await db.products.update_one({"_id": obj_id}, {"$set": product_update})
+    await record_write(db, "products", obj_id)
+    invalidate_catalog()
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
         
     updated_product = await db.products.find_one({"_id": obj_id})
-    updated_product["_id"] = str(updated_product["_id"])
-    if "user" in updated_product:
-        updated_product["user"] = str(updated_product["user"])
 
-    return {
+    return BSONResponse({
         "success": True,
         "product": updated_product
-    }
+    })
+
+@router.post("/admin/product/{id}/images")
+async def upload_product_images(id: str, images: List[UploadFile] = File(...), current_user: dict = Depends(get_current_user)):
+    if current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    db = db_manager.get_db()
+    try:
+        obj_id = ObjectId(id)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid ID")
+
+    if not await db.products.find_one({"_id": obj_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    # Variants are rendered once here, in worker processes, never per request
+    stored = [await store_image(image) for image in images]
+    await db.products.update_one({"_id": obj_id}, {"$push": {"images": {"$each": stored}}})
+    await record_write(db, "products", obj_id)
+    invalidate_catalog()
+
+    return BSONResponse({"success": True, "images": stored})
 
 @router.delete("/admin/product/{id}")
 async def delete_product(id: str, current_user: dict = Depends(get_current_user)):
@@ -169,6 +260,8 @@ async def delete_product(id: str, current_user: dict = Depends(get_current_user)
         raise HTTPException(status_code=400, detail="Invalid ID")
         
     result = await db.products.delete_one({"_id": obj_id})
+    await record_delete(db, "products", obj_id)
+    invalidate_catalog()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
         
@@ -183,119 +276,66 @@ async def create_review(
     productId: str = Body(...),
     current_user: dict = Depends(get_current_user)
 ):
-    db = db_manager.get_db()
+    db = db_manager.get_db("reviews")
     try:
         obj_id = ObjectId(productId)
     except:
         raise HTTPException(status_code=400, detail="Invalid Product ID")
 
-    review = {
-        "_id": ObjectId(),
-        "user": ObjectId(current_user["_id"]),
-        "name": current_user["name"],
-        "rating": float(rating),
-        "comment": comment
-    }
-
-    product = await db.products.find_one({"_id": obj_id})
-    if not product:
+    # On the primary: the product may have been created moments ago
+    if not await db_manager.get_db("catalog_primary").products.find_one({"_id": obj_id}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="Product not found")
 
-    reviews = product.get("reviews", [])
-    
-    # Check if user already reviewed
-    already_reviewed = False
-    for r in reviews:
-        if str(r.get("user")) == str(current_user["_id"]):
-            r["comment"] = comment
-            r["rating"] = float(rating)
-            already_reviewed = True
-            break
-            
-    if not already_reviewed:
-        reviews.append(review)
-        
-    # Calculate new ratings
-    avg_rating = 0
-    if len(reviews) > 0:
-        total = sum(r["rating"] for r in reviews)
-        avg_rating = total / len(reviews)
-
-    await db.products.update_one(
-        {"_id": obj_id},
-        {
-            "$set": {
-                "reviews": reviews,
-                "ratings": avg_rating,
-                "numOfReviews": len(reviews)
-            }
-        }
-    )
+    review_id = await upsert_review(db, obj_id, current_user, float(rating), comment)
+    await record_write(db, "reviews", review_id)
+    await record_write(db, "products", obj_id)
+    invalidate_catalog()
 
     return {"success": True}
 
 @router.get("/reviews")
-async def get_product_reviews(id: str = Query(...)):
-    db = db_manager.get_db()
+async def get_product_reviews(
+    request: Request,
+    id: str = Query(...),
+    after: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500)
+):
+    db = catalog_db("reviews", product_id=id)
     try:
         obj_id = ObjectId(id)
+        after_id = ObjectId(after) if after else None
     except:
         raise HTTPException(status_code=400, detail="Invalid Product ID")
-        
-    product = await db.products.find_one({"_id": obj_id})
-    if not product:
+
+    reviews, next_cursor = await list_reviews(db, obj_id, after_id, limit)
+    if not reviews and after_id is None and not await db.products.find_one({"_id": obj_id}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    reviews = product.get("reviews", [])
-    for r in reviews:
-        if "user" in r:
-            r["user"] = str(r["user"])
-        if "_id" in r:
-            r["_id"] = str(r["_id"])
             
-    return {
+    result = {
         "success": True,
-        "reviews": reviews
+        "reviews": reviews,
+        "nextCursor": next_cursor
     }
+    # Not cached here, but a client holding these exact bytes still gets a 304
+    return catalog_response(request, *render(result))
 
 @router.delete("/reviews")
 async def delete_review(id: str = Query(...), productId: str = Query(...), current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
         
-    db = db_manager.get_db()
+    db = db_manager.get_db("reviews")
     try:
         prod_obj_id = ObjectId(productId)
         review_obj_id = ObjectId(id)
     except:
         raise HTTPException(status_code=400, detail="Invalid ID")
-        
-    product = await db.products.find_one({"_id": prod_obj_id})
-    if not product:
+
+    if await remove_review(db, prod_obj_id, review_obj_id):
+        await record_delete(db, "reviews", review_obj_id)
+        await record_write(db, "products", prod_obj_id)
+    elif not await db_manager.get_db("catalog_primary").products.find_one({"_id": prod_obj_id}, {"_id": 1}):
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    reviews = product.get("reviews", [])
-    
-    # Filter out the review to delete
-    new_reviews = [r for r in reviews if str(r.get("_id")) != id]
-    
-    # Recalculate ratings
-    avg_rating = 0
-    if len(new_reviews) > 0:
-        total = sum(r["rating"] for r in new_reviews)
-        avg_rating = total / len(new_reviews)
-        
-    await db.products.update_one(
-        {"_id": prod_obj_id},
-        {
-            "$set": {
-                "reviews": new_reviews,
-                "ratings": avg_rating,
-                "numOfReviews": len(new_reviews)
-            }
-        }
-    )
+    invalidate_catalog()
         
     return {"success": True}
-
-
@@ -1,7 +1,14 @@
+import argparse
 import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
+from utils.password import pwd_context
+from utils.rollups import rebuild_rollups
 
+# The original hand-picked catalog, still used when no volumes are requested
 products = [
     {
         "name": "OPPO F21s Pro 5G",
@@ -69,20 +76,301 @@ products = [
     }
 ]
 
-async def seed_products():
-    uri = "mongodb://localhost:27017/favcart"
-    client = AsyncIOMotorClient(uri)
-    db = client.get_default_database()
-    
+CATEGORIES = ["Electronics", "Mobile Phones", "Laptops", "Accessories", "Headphones", "Food",
+              "Books", "Clothes/Shoes", "Beauty/Health", "Sports", "Outdoor", "Home"]
+SELLERS = ["Amazon", "Flipkart", "Ebay", "Meesho", "Myntra", "Snapdeal"]
+BRANDS = ["OPPO", "Dell", "PTron", "Boat", "Sony", "Samsung", "Lenovo", "HP", "Noise", "Redmi",
+          "Apple", "Asus", "JBL", "Puma", "Nike", "Prestige", "Philips", "Lakme", "Himalaya", "Wildcraft"]
+ADJECTIVES = ["Pro", "Ultra", "Lite", "Max", "Mini", "Plus", "Air", "Neo", "Prime", "Classic",
+              "Wireless", "Smart", "Portable", "Compact", "Deluxe", "Sport", "Eco", "Turbo"]
+NOUNS = ["Phone", "Laptop", "Watch", "Earbuds", "Headphones", "Speaker", "Charger", "Backpack",
+         "Shoes", "T-Shirt", "Cooker", "Trimmer", "Keyboard", "Mouse", "Monitor", "Tablet", "Camera",
+         "Bottle", "Jacket", "Lamp"]
+WORDS = ["durable", "lightweight", "fast", "premium", "bluetooth", "battery", "display", "comfortable",
+         "stylish", "warranty", "waterproof", "charging", "sound", "quality", "design", "performance"]
+COMMENTS = ["Great product!", "Value for money.", "Not as described.", "Works fine.", "Excellent quality.",
+            "Stopped working after a month.", "Fast delivery.", "Would buy again.", "Average.", "Loved it!"]
+CITIES = [("Hyderabad", "Telangana"), ("Bengaluru", "Karnataka"), ("Chennai", "Tamil Nadu"),
+          ("Mumbai", "Maharashtra"), ("Delhi", "Delhi"), ("Kolkata", "West Bengal"), ("Pune", "Maharashtra")]
+ORDER_STATUSES = ["Processing", "Shipped", "Delivered"]
+
+# High byte of generated ObjectIds, so ids never collide across collections
+USER_KIND, PRODUCT_KIND, ORDER_KIND, REVIEW_KIND = 1, 2, 3, 4
+BASE_DATE = datetime(2024, 1, 1)
+
+
+class Generator:
+    """Deterministic document factories: the same seed and index always give the same document.
+
+    Ids are derived from (kind, seed, index), and every document draws from its
+    own Random seeded the same way, so orders and reviews can reference users
+    and products by index without keeping them in memory.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.seed = args.seed
+        # Zipf-like popularity over categories
+        self.category_weights = [1 / (rank + 1) ** args.category_skew for rank in range(len(CATEGORIES))]
+        self.password_hashes = []
+
+    def make_id(self, kind, index):
+        return ObjectId(bytes([kind]) + (self.seed % 2 ** 24).to_bytes(3, "big") + index.to_bytes(8, "big"))
+
+    def rng(self, kind, index):
+        return random.Random((self.seed * 16 + kind) * 1_000_000_007 + index)
+
+    def skewed_index(self, rng, count, alpha):
+        # Pareto-distributed rank: a few popular items, a long tail
+        return min(count - 1, int(rng.paretovariate(alpha)) - 1)
+
+    def product_core(self, index):
+        rng = self.rng(PRODUCT_KIND, index)
+        name = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {index}"
+        price = round(min(rng.lognormvariate(self.args.price_mu, self.args.price_sigma), 200000), 2)
+        return rng, name, price
+
+    def prepare_passwords(self):
+        # bcrypt is deliberately slow, so hash a small pool once and share it
+        self.password_hashes = [
+            pwd_context.hash(f"password{i}") for i in range(self.args.password_pool)
+        ]
+
+    def user(self, index):
+        rng = self.rng(USER_KIND, index)
+        return {
+            "_id": self.make_id(USER_KIND, index),
+            "name": f"User {index}",
+            # Load tests log in as userN@favcart.test / password{N % password_pool}
+            "email": f"user{index}@favcart.test",
+            "password": self.password_hashes[index % len(self.password_hashes)],
+            "role": "admin" if index == 0 else "user",
+            "createdAt": BASE_DATE + timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+        }
+
+    def product(self, index, reviews_out):
+        rng, name, price = self.product_core(index)
+        product_id = self.make_id(PRODUCT_KIND, index)
+
+        review_count = 0
+        if self.args.users and self.args.max_reviews:
+            review_count = min(self.args.max_reviews, self.args.users,
+                               int(rng.paretovariate(self.args.review_alpha)) - 1)
+        rating_sum = 0.0
+        for n, user_index in enumerate(rng.sample(range(self.args.users), review_count)):
+            # Ratings lean positive, like real storefronts
+            rating = float(min(5, max(1, round(rng.triangular(1, 5, 4.5)))))
+            rating_sum += rating
+            reviews_out.append({
+                "_id": self.make_id(REVIEW_KIND, index * self.args.max_reviews + n),
+                "product": product_id,
+                "user": self.make_id(USER_KIND, user_index),
+                "name": f"User {user_index}",
+                "rating": rating,
+                "comment": rng.choice(COMMENTS),
+                "createdAt": BASE_DATE + timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+            })
+
+        return {
+            "_id": product_id,
+            "name": name,
+            "price": price,
+            "description": " ".join(rng.choices(WORDS, k=rng.randint(10, 40))).capitalize() + ".",
+            "category": rng.choices(CATEGORIES, weights=self.category_weights)[0],
+            "seller": rng.choice(SELLERS),
+            "stock": rng.randint(0, 500),
+            "images": [{"image": f"/images/products/{index % 12 + 1}.jpg"}],
+            "ratingSum": rating_sum,
+            "numOfReviews": review_count,
+            "ratings": rating_sum / review_count if review_count else 0,
+            "reviews": [],
+            "createdAt": BASE_DATE + timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+        }
+
+    def order(self, index):
+        rng = self.rng(ORDER_KIND, index)
+        items = []
+        item_count = min(self.args.max_items, int(rng.paretovariate(self.args.items_alpha)))
+        for _ in range(item_count):
+            product_index = self.skewed_index(rng, self.args.products, self.args.popularity_alpha)
+            _, name, price = self.product_core(product_index)
+            items.append({
+                "name": name,
+                "quantity": rng.randint(1, 3),
+                "image": f"/images/products/{product_index % 12 + 1}.jpg",
+                "price": price,
+                "product": str(self.make_id(PRODUCT_KIND, product_index)),
+            })
+
+        items_price = round(sum(i["price"] * i["quantity"] for i in items), 2)
+        tax_price = round(items_price * 0.05, 2)
+        shipping_price = 0.0 if items_price > 200 else 25.0
+        created_at = BASE_DATE + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+        status = rng.choices(ORDER_STATUSES, weights=[2, 3, 5])[0]
+        city, state = rng.choice(CITIES)
+        return {
+            "_id": self.make_id(ORDER_KIND, index),
+            "shippingInfo": {
+                "address": f"{rng.randint(1, 999)} Main Road",
+                "city": city,
+                "phoneNo": f"9{rng.randint(100000000, 999999999)}",
+                "postalCode": str(rng.randint(500000, 599999)),
+                "country": "India",
+                "state": state,
+            },
+            "orderItems": items,
+            "user": str(self.make_id(USER_KIND, rng.randrange(self.args.users))),
+            "paymentInfo": {"id": f"pi_{index}", "status": "succeeded"},
+            "paidAt": created_at,
+            "itemsPrice": items_price,
+            "taxPrice": tax_price,
+            "shippingPrice": shipping_price,
+            "totalPrice": round(items_price + tax_price + shipping_price, 2),
+            "orderStatus": status,
+            "deliveredAt": created_at + timedelta(days=rng.randint(2, 7)) if status == "Delivered" else None,
+            "createdAt": created_at,
+        }
+
+
+class BatchWriter:
+    """Unordered insert_many batches with a bounded number in flight."""
+
+    def __init__(self, collection, batch_size, concurrency):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pending = set()
+        self.buffer = []
+        self.written = 0
+
+    async def _insert(self, docs):
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+            self.written += len(docs)
+        finally:
+            self.semaphore.release()
+
+    async def add(self, doc):
+        self.buffer.append(doc)
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        docs, self.buffer = self.buffer, []
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._insert(docs))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def close(self):
+        await self.flush()
+        if self.pending:
+            await asyncio.gather(*self.pending)
+
+
+def report(label, count, started):
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"  {label:<9} {count:>10,d} docs in {elapsed:7.1f}s  ({rate:,.0f} docs/sec)")
+
+
+async def generate(db, args):
+    gen = Generator(args)
+    if args.users:
+        print(f"Hashing {args.password_pool} shared passwords...")
+        gen.prepare_passwords()
+
+    writers = {name: BatchWriter(db[name], args.batch_size, args.concurrency)
+               for name in ("users", "products", "reviews", "orders")}
+
+    print("Generating data...")
+    started = time.perf_counter()
+    for i in range(args.users):
+        await writers["users"].add(gen.user(i))
+    await writers["users"].close()
+    report("users", writers["users"].written, started)
+
+    started = time.perf_counter()
+    reviews = []
+    for i in range(args.products):
+        await writers["products"].add(gen.product(i, reviews))
+        for review in reviews:
+            await writers["reviews"].add(review)
+        reviews.clear()
+    await writers["products"].close()
+    await writers["reviews"].close()
+    report("products", writers["products"].written, started)
+    report("reviews", writers["reviews"].written, started)
+
+    started = time.perf_counter()
+    # Orders reference generated users and products by index
+    if args.products and args.users:
+        for i in range(args.orders):
+            await writers["orders"].add(gen.order(i))
+    await writers["orders"].close()
+    report("orders", writers["orders"].written, started)
+
+    if writers["orders"].written:
+        print("Rebuilding sales rollups...")
+        await rebuild_rollups(db)
+
+
+async def seed_products(db):
     print("Deleting existing products...")
     await db.products.delete_many({})
     
     print("Inserting new products...")
     for product in products:
         product["createdAt"] = datetime.now()
-        await db.products.insert_one(product)
+    await db.products.insert_many(products)
         
     print("Products seeded successfully!")
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Seed the demo catalog, or generate a large deterministic dataset for capacity tests."
+    )
+    parser.add_argument("--uri", default="mongodb://localhost:27017/favcart")
+    parser.add_argument("--users", type=int, default=0)
+    parser.add_argument("--products", type=int, default=0)
+    parser.add_argument("--orders", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42, help="same seed, same documents")
+    parser.add_argument("--drop", action="store_true", help="empty the generated collections first")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8, help="insert_many batches in flight")
+    parser.add_argument("--password-pool", type=int, default=8, help="distinct pre-hashed passwords")
+
+    dist = parser.add_argument_group("distributions")
+    dist.add_argument("--price-mu", type=float, default=6.0, help="lognormal price mean (log scale)")
+    dist.add_argument("--price-sigma", type=float, default=1.2)
+    dist.add_argument("--category-skew", type=float, default=1.1, help="Zipf exponent over categories")
+    dist.add_argument("--review-alpha", type=float, default=1.3, help="Pareto shape of reviews per product")
+    dist.add_argument("--max-reviews", type=int, default=50)
+    dist.add_argument("--items-alpha", type=float, default=2.5, help="Pareto shape of items per order")
+    dist.add_argument("--max-items", type=int, default=6)
+    dist.add_argument("--popularity-alpha", type=float, default=1.2, help="Pareto shape of product popularity")
+    return parser.parse_args(argv)
+
+
+async def main():
+    args = parse_args()
+    client = AsyncIOMotorClient(args.uri)
+    db = client.get_default_database()
+
+    if not (args.users or args.products or args.orders):
+        await seed_products(db)
+        return
+
+    if args.drop:
+        print("Dropping generated collections...")
+        for name in ("users", "products", "reviews", "orders", "sales_rollups"):
+            await db[name].drop()
+
+    await generate(db, args)
+    print("Data generated successfully!")
+
 if __name__ == "__main__":
-    asyncio.run(seed_products())
+    asyncio.run(main())
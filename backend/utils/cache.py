@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from config.database import db_manager, MAX_STALENESS_SECONDS
+
+logger = logging.getLogger("Cache")
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key):
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        if self._data:
+            self.invalidations += 1
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class CountCache:
+    """Per-filter document counts that are served stale and refreshed in the background.
+
+    Only the first request for a filter signature pays for `count_documents`;
+    after that the cached value is returned immediately and, once older than
+    `ttl`, a single background task recounts it.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._counts = OrderedDict()
+        self._refreshing = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def _count(self, collection, query: dict):
+        if not query:
+            # Collection metadata, no scan
+            return await collection.estimated_document_count()
+        return await collection.count_documents(query)
+
+    async def _refresh(self, key, collection, query: dict):
+        try:
+            self._store(key, await self._count(collection, query))
+            self.refreshes += 1
+        except Exception as e:
+            logger.warning(f"Background count refresh failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+
+    def _store(self, key, count):
+        self._counts[key] = (time.monotonic(), count)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.maxsize:
+            self._counts.popitem(last=False)
+
+    async def get(self, collection, query: dict):
+        key = json.dumps(query, sort_keys=True, default=str)
+        entry = self._counts.get(key)
+        if entry is None:
+            self.misses += 1
+            count = await self._count(collection, query)
+            self._store(key, count)
+            return count
+
+        computed_at, count = entry
+        self.hits += 1
+        self._counts.move_to_end(key)
+        if time.monotonic() - computed_at > self.ttl and key not in self._refreshing:
+            self._refreshing[key] = asyncio.create_task(self._refresh(key, collection, query))
+        return count
+
+    def mark_stale(self):
+        # Keep serving the old numbers, but recount on the next read
+        for key, (_, count) in self._counts.items():
+            self._counts[key] = (float("-inf"), count)
+
+    def stats(self):
+        return {
+            "size": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
+
+
+catalog_cache = TTLCache(
+    "catalog",
+    maxsize=int(os.getenv("CATALOG_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("CATALOG_CACHE_TTL", "60")),
+)
+
+product_counts = CountCache(ttl=float(os.getenv("CATALOG_COUNT_TTL", "30")))
+
+# Kept short because other workers only see user writes once the entry expires
+user_cache = TTLCache(
+    "users",
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "30")),
+)
+
+
+# Bumped on every catalog-wide write, so a result built across one is not cached
+catalog_state = {"version": 0, "writtenAt": float("-inf")}
+
+# A secondary may trail by up to max staleness (plus a heartbeat to notice), so catalog
+# reads that could refill the cache go to the primary for this long after a write
+FRESH_READ_WINDOW = MAX_STALENESS_SECONDS + 10
+# product id -> time of its last stock write, oldest first
+_written_products = OrderedDict()
+
+
+def catalog_list_key(query: dict, *parts):
+    # Normalize the filter dict so equivalent queries share one entry
+    return ("list", json.dumps(query, sort_keys=True, default=str)) + parts
+
+
+def catalog_product_key(id: str):
+    return ("product", id)
+
+
+def write_stamp(product_id=None):
+    """Changes when a write could affect a result: compare before and after building it."""
+    stamp = catalog_state["version"]
+    if product_id is None:
+        return stamp
+    return stamp, _written_products.get(str(product_id))
+
+
+def invalidate_catalog():
+    # Catalog writes are rare, so a full flush keeps list pages and details consistent
+    catalog_state["version"] += 1
+    catalog_state["writtenAt"] = time.monotonic()
+    catalog_cache.clear()
+    product_counts.mark_stale()
+
+
+def invalidate_products(*ids):
+    # Stock changes on every order; drop just those details and let list pages age out
+    now = time.monotonic()
+    for id in ids:
+        catalog_cache.pop(catalog_product_key(str(id)))
+        _written_products.pop(str(id), None)
+        _written_products[str(id)] = now
+    while _written_products and next(iter(_written_products.values())) < now - FRESH_READ_WINDOW:
+        _written_products.popitem(last=False)
+
+
+def catalog_db(workload: str = "catalog", product_id=None):
+    """Handle for a catalog or review read: the primary while a recent write may not have
+    reached the secondaries, so the cache is never refilled with pre-write data."""
+    now = time.monotonic()
+    recent = now - catalog_state["writtenAt"] < FRESH_READ_WINDOW
+    if not recent and product_id is not None:
+        recent = now - _written_products.get(str(product_id), float("-inf")) < FRESH_READ_WINDOW
+    return db_manager.get_db("catalog_primary" if recent else workload)
+
+
+def invalidate_user(id):
+    user_cache.pop(str(id))
+
+
+def cache_stats():
+    return {
+        "catalog": catalog_cache.stats(),
+        "productCounts": product_counts.stats(),
+        "users": user_cache.stats(),
+    }
+
+
+async def watch_catalog_changes():
+    """Flush the catalog cache whenever another worker writes to `products`.
+
+    Change streams need a replica set, so the watcher idles while the manager
+    runs in standalone mode and resumes after the next reconnect.
+    """
+    logger.info("Starting catalog change stream watcher...")
+    while True:
+        if db_manager.mode != "replica" or db_manager.get_db() is None:
+            await asyncio.sleep(5)
+            continue
+
+        try:
+            db = db_manager.get_db()
+            async with db.products.watch() as stream:
+                invalidate_catalog()
+                async for change in stream:
+                    update = change.get("updateDescription") or {}
+                    if (change["operationType"] == "update" and not update.get("removedFields")
+                            and set(update.get("updatedFields", {})) <= {"stock"}):
+                        # An order reserving stock; no need to flush every list page
+                        invalidate_products(change["documentKey"]["_id"])
+                    else:
+                        invalidate_catalog()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Catalog change stream interrupted: {e}")
+            invalidate_catalog()
+            await asyncio.sleep(5)
@@ -1,36 +1,289 @@
+import asyncio
+import logging
 import smtplib
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from config.database import db_manager
 
 load_dotenv("backend/config/config.env")
 
+logger = logging.getLogger("EmailDispatcher")
+
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE = float(os.getenv("EMAIL_RETRY_BASE", "2"))
+# Close the SMTP session after this many idle seconds
+EMAIL_IDLE_TIMEOUT = float(os.getenv("EMAIL_IDLE_TIMEOUT", "30"))
+# A claimed outbox row not touched for this long belongs to a dead worker and is taken over
+EMAIL_CLAIM_TIMEOUT = float(os.getenv("EMAIL_CLAIM_TIMEOUT", "300"))
+# Finished rows (body already removed) are kept this long for auditing
+EMAIL_OUTBOX_RETENTION = int(os.getenv("EMAIL_OUTBOX_RETENTION", str(7 * 24 * 3600)))
+
+# Identifies this worker's claims on outbox rows
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+OUTBOX_INDEXES = [
+    # Claiming pending and abandoned rows, oldest first
+    IndexModel([("status", ASCENDING), ("createdAt", ASCENDING)], name="status_created"),
+    # Only sent/failed rows have completedAt, so queued mail is never expired
+    IndexModel([("completedAt", ASCENDING)], expireAfterSeconds=EMAIL_OUTBOX_RETENTION, name="completed_ttl"),
+]
+
+
+def smtp_settings():
+    return {
+        "host": os.getenv("SMTP_HOST"),
+        "port": os.getenv("SMTP_PORT"),
+        "user": os.getenv("SMTP_USER"),
+        "password": os.getenv("SMTP_PASS"),
+        "from_email": os.getenv("SMTP_FROM_EMAIL"),
+        "from_name": os.getenv("SMTP_FROM_NAME"),
+        # Local stand-ins such as aiosmtpd speak plain SMTP without auth
+        "starttls": os.getenv("SMTP_STARTTLS", "true").lower() != "false",
+    }
+
+
+class EmailDispatcher:
+    """Background sender that batches queued mail over one reused SMTP session.
+
+    Every message is first written to the `email_outbox` collection, claimed by
+    the worker that queued it, so mail that was not yet delivered is picked up
+    again after a restart. Rows are claimed atomically, and a claim is only taken
+    over once it is older than EMAIL_CLAIM_TIMEOUT, so each message has a single
+    sender. The body (which may hold a reset link) is removed once the row is
+    finished. All SMTP I/O runs on a single dedicated thread that owns the connection.
+    """
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.reclaimer = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self.server = None
+        self.sent = 0
+        self.failed = 0
+
+    # --- SMTP session (runs on the executor thread) ---
+
+    def _connect(self, settings):
+        server = smtplib.SMTP(settings["host"], int(settings["port"]), timeout=30)
+        if settings["starttls"]:
+            server.starttls()
+        if settings["user"] and settings["password"]:
+            server.login(settings["user"], settings["password"])
+        return server
+
+    def _close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+    def _send_batch(self, batch):
+        settings = smtp_settings()
+        results = []
+        for item in batch:
+            msg = MIMEMultipart()
+            msg["From"] = f"{settings['from_name']} <{settings['from_email']}>"
+            msg["To"] = item["to"]
+            msg["Subject"] = item["subject"]
+            msg.attach(MIMEText(item["message"], "html"))
+
+            error = None
+            # A reused session may have been dropped by the server, so reconnect once
+            for _ in range(2):
+                try:
+                    if self.server is None:
+                        self.server = self._connect(settings)
+                    self.server.sendmail(settings["from_email"], item["to"], msg.as_string())
+                    error = None
+                    break
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    error = e
+                    self._close()
+                except Exception as e:
+                    error = e
+                    break
+            results.append(error)
+        return results
+
+    # --- Queue handling ---
+
+    async def enqueue(self, subject: str, message: str, to_email: str):
+        item = {"subject": subject, "message": message, "to": to_email, "attempts": 0}
+
+        db = db_manager.get_db()
+        if db is not None:
+            now = datetime.utcnow()
+            result = await db.email_outbox.insert_one({
+                **item,
+                "status": "sending",
+                "claimedBy": WORKER_ID,
+                "claimedAt": now,
+                "createdAt": now,
+            })
+            item["_id"] = result.inserted_id
+
+        await self.queue.put(item)
+
+    async def _mark(self, item, update, unset=None):
+        db = db_manager.get_db()
+        if db is None or "_id" not in item:
+            return
+        change = {"$set": update}
+        if unset:
+            change["$unset"] = {field: "" for field in unset}
+        try:
+            await db.email_outbox.update_one({"_id": item["_id"], "claimedBy": WORKER_ID}, change)
+        except Exception as e:
+            logger.warning(f"Could not update outbox entry {item['_id']}: {e}")
+
+    async def _renew_claims(self, batch):
+        """Refresh this worker's claims before sending; drop rows another worker took over."""
+        db = db_manager.get_db()
+        ids = [item["_id"] for item in batch if "_id" in item]
+        if db is None or not ids:
+            return batch
+        owned = {"_id": {"$in": ids}, "claimedBy": WORKER_ID, "status": "sending"}
+        try:
+            await db.email_outbox.update_many(owned, {"$set": {"claimedAt": datetime.utcnow()}})
+            kept = {doc["_id"] async for doc in db.email_outbox.find(owned, {"_id": 1})}
+        except Exception as e:
+            # Sending late beats not sending; the claim still protects against a second sender
+            logger.warning(f"Could not renew outbox claims: {e}")
+            return batch
+        return [item for item in batch if "_id" not in item or item["_id"] in kept]
+
+    async def _retry_later(self, item, delay):
+        await asyncio.sleep(delay)
+        await self.queue.put(item)
+
+    async def _handle_results(self, batch, results):
+        for item, error in zip(batch, results):
+            if error is None:
+                self.sent += 1
+                now = datetime.utcnow()
+                await self._mark(item, {"status": "sent", "sentAt": now, "completedAt": now}, unset=["message"])
+                continue
+
+            item["attempts"] += 1
+            if item["attempts"] >= EMAIL_MAX_ATTEMPTS:
+                self.failed += 1
+                logger.error(f"Giving up on email to {item['to']}: {error}")
+                await self._mark(item, {
+                    "status": "failed",
+                    "attempts": item["attempts"],
+                    "error": str(error),
+                    "completedAt": datetime.utcnow(),
+                }, unset=["message"])
+                continue
+
+            delay = EMAIL_RETRY_BASE ** item["attempts"]
+            logger.warning(f"Email to {item['to']} failed ({error}), retrying in {delay:.0f}s")
+            await self._mark(item, {
+                "attempts": item["attempts"],
+                # Renew the claim so the retry wait doesn't look like a dead worker
+                "claimedAt": datetime.utcnow(),
+                "nextAttemptAt": datetime.utcnow() + timedelta(seconds=delay),
+            })
+            asyncio.create_task(self._retry_later(item, delay))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                first = await asyncio.wait_for(self.queue.get(), timeout=EMAIL_IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                await loop.run_in_executor(self.executor, self._close)
+                continue
+
+            batch = [first]
+            while len(batch) < EMAIL_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            batch = await self._renew_claims(batch)
+            if not batch:
+                continue
+            try:
+                results = await loop.run_in_executor(self.executor, self._send_batch, batch)
+            except Exception as e:
+                results = [e] * len(batch)
+            await self._handle_results(batch, results)
+
+    async def _claim_outbox(self):
+        """Claim rows nobody is sending: legacy pending rows and claims that timed out."""
+        db = db_manager.get_db()
+        if db is None:
+            return
+        restored = 0
+        while True:
+            now = datetime.utcnow()
+            doc = await db.email_outbox.find_one_and_update(
+                {"$or": [
+                    {"status": "pending"},
+                    {"status": "sending", "claimedAt": {"$lt": now - timedelta(seconds=EMAIL_CLAIM_TIMEOUT)}},
+                ]},
+                {"$set": {"status": "sending", "claimedBy": WORKER_ID, "claimedAt": now}},
+                sort=[("createdAt", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            await self.queue.put({
+                "_id": doc["_id"],
+                "subject": doc["subject"],
+                "message": doc["message"],
+                "to": doc["to"],
+                "attempts": doc.get("attempts", 0),
+            })
+            restored += 1
+        if restored:
+            logger.info(f"Claimed {restored} pending emails from outbox.")
+
+    async def _reclaim(self):
+        # Other workers' claims only time out while this one is running, so keep looking
+        while True:
+            try:
+                await self._claim_outbox()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not restore email outbox: {e}")
+            await asyncio.sleep(EMAIL_CLAIM_TIMEOUT)
+
+    async def start(self):
+        self.reclaimer = asyncio.create_task(self._reclaim())
+        self.worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for task in (self.reclaimer, self.worker):
+            if task:
+                task.cancel()
+        self.reclaimer = None
+        self.worker = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._close)
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        return {"queued": self.queue.qsize(), "sent": self.sent, "failed": self.failed}
+
+
+email_dispatcher = EmailDispatcher()
+
+
 async def send_email(subject: str, message: str, to_email: str):
-    smtp_host = os.getenv("SMTP_HOST")
-    smtp_port = os.getenv("SMTP_PORT")
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_pass = os.getenv("SMTP_PASS")
-    from_email = os.getenv("SMTP_FROM_EMAIL")
-    from_name = os.getenv("SMTP_FROM_NAME")
-
-    if not all([smtp_host, smtp_port, smtp_user, smtp_pass]):
+    settings = smtp_settings()
+    if not all([settings["host"], settings["port"]]):
         print("SMTP configuration missing. Email not sent.")
         return
 
-    msg = MIMEMultipart()
-    msg["From"] = f"{from_name} <{from_email}>"
-    msg["To"] = to_email
-    msg["Subject"] = subject
-
-    msg.attach(MIMEText(message, "html"))
-
-    try:
-        server = smtplib.SMTP(smtp_host, int(smtp_port))
-        server.starttls()
-        server.login(smtp_user, smtp_pass)
-        server.sendmail(from_email, to_email, msg.as_string())
-        server.quit()
-        print(f"Email sent to {to_email}")
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+    # Returns once the message is persisted and queued; delivery happens in the background
+    await email_dispatcher.enqueue(subject, message, to_email)
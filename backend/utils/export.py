@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _value(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+async def _ndjson_chunks(cursor, fields):
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps({f: _value(doc[f]) for f in fields if f in doc}, default=str))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def _csv_chunks(cursor, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    async for doc in cursor:
+        writer.writerow([_value(doc.get(f, "")) for f in fields])
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def export_collection(collection, fields, fmt: str, after: str = None, query: dict = None, filename: str = "export"):
+    """Stream a collection as NDJSON or CSV in `_id` order without buffering it.
+
+    Only `fields` are fetched from MongoDB. Passing the last `_id` a client
+    received as `after` resumes an interrupted export.
+    """
+    if fmt not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'csv'")
+
+    query = dict(query or {})
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid ID")
+
+    projection = {f: 1 for f in fields}
+    cursor = collection.find(query, projection).sort("_id", 1).batch_size(EXPORT_BATCH_SIZE)
+
+    chunks = _ndjson_chunks(cursor, fields) if fmt == "ndjson" else _csv_chunks(cursor, fields)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    )
@@ -0,0 +1,48 @@
+from fastapi import HTTPException
+
+# Fields a client may ask for with ?fields=; _id is always returned
+PRODUCT_FIELDS = ["name", "price", "description", "ratings", "images", "category", "seller",
+                  "stock", "numOfReviews", "user", "createdAt"]
+ORDER_FIELDS = ["shippingInfo", "orderItems", "user", "paymentInfo", "paidAt", "itemsPrice", "taxPrice",
+                "shippingPrice", "totalPrice", "orderStatus", "deliveredAt", "createdAt"]
+
+# Named views usable in ?fields= alongside plain field names (e.g. fields=card,description)
+PRODUCT_VIEWS = {
+    # Listing cards only show the first image
+    "card": {"name": 1, "price": 1, "images": {"$slice": 1}, "ratings": 1, "numOfReviews": 1},
+    "summary": {f: 1 for f in ["name", "price", "category", "seller", "stock", "ratings", "numOfReviews", "createdAt"]},
+    # Everything except the legacy embedded reviews array and internal rating sum
+    "detail": {f: 1 for f in PRODUCT_FIELDS},
+}
+ORDER_VIEWS = {
+    "summary": {
+        "orderStatus": 1, "totalPrice": 1, "paidAt": 1, "deliveredAt": 1, "createdAt": 1,
+        "numOfItems": {"$size": {"$ifNull": ["$orderItems", []]}},
+    },
+    "detail": {f: 1 for f in ORDER_FIELDS},
+}
+
+
+def parse_fields(fields, allowed, views, default="detail"):
+    """Turn a comma separated ?fields= value of field and view names into a MongoDB projection."""
+    if not fields:
+        return dict(views[default])
+
+    projection = {}
+    explicit = set()
+    for name in fields.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name in views:
+            for field, value in views[name].items():
+                # A field asked for by name wins over a view's narrower form of it
+                if field not in explicit:
+                    projection[field] = value
+        elif name in allowed:
+            projection[name] = 1
+            explicit.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown field '{name}'")
+
+    return projection or dict(views[default])
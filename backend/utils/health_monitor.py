@@ -1,10 +1,41 @@
 import asyncio
 import logging
+import os
 import platform
+from datetime import datetime
 from config.database import db_manager
+from utils.journal import failback_with_replay
+from utils.rollups import rebuild_rollups
 
 logger = logging.getLogger("HealthMonitor")
 
+# Poll quickly while degraded so recovery is noticed early, slowly while healthy
+FAST_INTERVAL = float(os.getenv("HEALTH_FAST_INTERVAL", "5"))
+SLOW_INTERVAL = float(os.getenv("HEALTH_SLOW_INTERVAL", "30"))
+# Consecutive checks required before switching, so a single blip does not cause flapping
+FAILOVER_AFTER = int(os.getenv("HEALTH_FAILOVER_AFTER", "2"))
+FAILBACK_AFTER = int(os.getenv("HEALTH_FAILBACK_AFTER", "6"))
+# Secondaries further behind than this move catalog reads to the primary (never a failover)
+MAX_LAG_SECONDS = float(os.getenv("HEALTH_MAX_LAG", "10"))
+OVERHEAT_TEMP = 80
+# Failback after overheating waits until the machine has cooled below this
+COOLDOWN_TEMP = 75
+
+health_state = {
+    "mode": None,
+    "replicaHealthy": None,
+    "primary": None,
+    "term": None,
+    "elections": 0,
+    "maxLagSeconds": None,
+    "secondariesLagging": False,
+    "members": [],
+    "temperature": None,
+    "uptime": None,
+    "lastCheck": None,
+    "lastError": None,
+}
+
 async def get_cpu_temperature():
     system = platform.system()
     try:
@@ -28,33 +59,130 @@ async def get_cpu_temperature():
         return None
     return None
 
+def replica_client():
+    """Client to probe the replica set with: the active one, or the standby while in standalone."""
+    if db_manager.mode == "replica":
+        return db_manager.client
+    if db_manager.standby is not None and db_manager.standby.mode == "replica":
+        return db_manager.standby.client
+    return None
+
+async def check_replica_set(client):
+    status = await client.admin.command("replSetGetStatus")
+    members = status.get("members", [])
+    primary = next((m for m in members if m.get("stateStr") == "PRIMARY"), None)
+
+    lags = []
+    summary = []
+    for m in members:
+        lag = None
+        if primary is not None and m.get("stateStr") == "SECONDARY":
+            lag = (primary["optimeDate"] - m["optimeDate"]).total_seconds()
+            lags.append(lag)
+        summary.append({"name": m.get("name"), "state": m.get("stateStr"), "health": m.get("health"), "lagSeconds": lag})
+
+    term = status.get("term")
+    primary_name = primary.get("name") if primary else None
+    if health_state["term"] is not None and (term != health_state["term"] or primary_name != health_state["primary"]):
+        health_state["elections"] += 1
+        logger.warning(f"Replica set election: primary is now {primary_name} (term {term})")
+
+    healthy_members = sum(1 for m in members if m.get("health") == 1)
+    max_lag = max(lags) if lags else 0.0
+    healthy = primary is not None and healthy_members > len(members) // 2
+    # Slow secondaries only make their reads stale; the primary still serves everything
+    lagging = max_lag > MAX_LAG_SECONDS
+    if lagging != health_state["secondariesLagging"]:
+        logger.warning(f"Secondary lag {max_lag:.1f}s: catalog reads {'moved to the primary' if lagging else 'back on the secondaries'}")
+    db_manager.primary_reads = lagging
+
+    health_state.update({
+        "replicaHealthy": healthy,
+        "secondariesLagging": lagging,
+        "primary": primary_name,
+        "term": term,
+        "maxLagSeconds": max_lag,
+        "members": summary,
+    })
+    return healthy
+
+async def rebuild_rollups_after_replay(target, report):
+    # Rollups were incremented on both sides; recompute them from the merged orders
+    if "orders" in report["collections"]:
+        await rebuild_rollups(target)
+
 async def monitor_health():
     logger.info("Starting Health Monitor...")
+    failures = 0
+    recoveries = 0
     while True:
+        interval = FAST_INTERVAL
         try:
             # 1. Check Database
+            # A failed probe counts as one unhealthy check, like a degraded replica set
+            db_ok = True
             db = db_manager.get_db()
             if db is not None:
-                status = await db.command("serverStatus")
-                uptime = status.get("uptime", 0)
-                host = status.get("host", "unknown")
-                
-                # 2. Check Temperature
-                temp = await get_cpu_temperature()
-                temp_str = f", Temp: {temp:.1f}°C" if temp else ""
-                
-                logger.info(f"Health Check: OK - Host: {host}, Uptime: {uptime}s{temp_str}")
+                try:
+                    status = await db.command("serverStatus")
+                    uptime = status.get("uptime", 0)
+                    host = status.get("host", "unknown")
+
+                    # 2. Check Temperature
+                    temp = await get_cpu_temperature()
+                    temp_str = f", Temp: {temp:.1f}°C" if temp else ""
+                    health_state["temperature"] = temp
+                    health_state["uptime"] = uptime
+
+                    logger.info(f"Health Check: OK - Mode: {db_manager.mode}, Host: {host}, Uptime: {uptime}s{temp_str}")
+                except Exception as e:
+                    logger.error(f"Health Check Failed: {e}")
+                    health_state["lastError"] = str(e)
+                    db_ok = False
+                    temp = None
 
                 # 3. Safety Trigger
-                if temp and temp > 80:
+                if temp and temp > OVERHEAT_TEMP and db_manager.mode == "replica":
                     logger.critical(f"OVERHEATING DETECTED ({temp}°C). Initiating Failover...")
-                    await db_manager.disconnect()
-                    await db_manager.connect("standalone")
+                    await db_manager.failover("standalone")
+
+            # 4. Replica set membership, elections and lag
+            client = replica_client()
+            if client is None:
+                health_state["replicaHealthy"] = False
+                db_manager.schedule_standby()
+                healthy = False
+            else:
+                try:
+                    healthy = await check_replica_set(client)
+                except Exception as e:
+                    health_state["replicaHealthy"] = False
+                    health_state["lastError"] = str(e)
+                    healthy = False
+
+            if db_manager.mode == "replica":
+                recoveries = 0
+                failures = 0 if healthy and db_ok else failures + 1
+                if failures >= FAILOVER_AFTER:
+                    logger.critical(f"Replica set degraded for {failures} checks. Initiating Failover...")
+                    await db_manager.failover("standalone")
+                    failures = 0
+                elif healthy and db_ok:
+                    interval = SLOW_INTERVAL
+            else:
+                failures = 0
+                cool = health_state["temperature"] is None or health_state["temperature"] < COOLDOWN_TEMP
+                recoveries = recoveries + 1 if healthy and cool else 0
+                if recoveries >= FAILBACK_AFTER:
+                    logger.warning(f"Replica set healthy for {recoveries} checks. Failing back...")
+                    await failback_with_replay(rebuild_rollups_after_replay)
+                    recoveries = 0
 
         except Exception as e:
+            # A failed switch itself; the next check counts again rather than switching from here
             logger.error(f"Health Check Failed: {e}")
-            # Trigger failover if not already on standalone
-            if db_manager.mode == "replica":
-                await db_manager.connect("standalone")
+            health_state["lastError"] = str(e)
 
-        await asyncio.sleep(30) # Check every 30 seconds
+        health_state["mode"] = db_manager.mode
+        health_state["lastCheck"] = datetime.utcnow().isoformat()
+        await asyncio.sleep(interval)
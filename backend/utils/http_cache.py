@@ -0,0 +1,43 @@
+import hashlib
+import os
+from fastapi import Request, Response
+from utils.responses import dumps
+
+# Browsers revalidate every time by default; a reverse proxy in front may serve
+# a stale copy for up to CATALOG_STALE_WHILE_REVALIDATE seconds while it does
+MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "0"))
+STALE_WHILE_REVALIDATE = int(os.getenv("CATALOG_STALE_WHILE_REVALIDATE", "30"))
+CACHE_CONTROL = os.getenv(
+    "CATALOG_CACHE_CONTROL",
+    f"public, max-age={MAX_AGE}, stale-while-revalidate={STALE_WHILE_REVALIDATE}",
+)
+
+
+def render(content):
+    """Serialize once and tag: (body, strong ETag). The ETag hashes the bytes, so every
+    worker gives the same representation the same tag, and only changed content gets a new one."""
+    body = dumps(content)
+    return body, f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a proxy's W/ prefix still matches
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cache_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def catalog_response(request: Request, body: bytes, etag: str):
+    """A 304 if the client already holds this representation, otherwise the body."""
+    if etag_matches(request, etag):
+        return cache_headers(Response(status_code=304), etag)
+    return cache_headers(Response(content=body, media_type="application/json"), etag)
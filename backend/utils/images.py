@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException, UploadFile
+
+UPLOAD_DIR = os.path.join("uploads", "products")
+UPLOAD_URL = "/uploads/products"
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Resizing is CPU-bound Python/C work that holds the GIL, so it gets processes, not threads
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Longest side in pixels for each pre-generated variant
+VARIANT_SIZES = {"thumb": 300, "medium": 800}
+FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+
+
+class ImageTooLarge(ValueError):
+    """Decoded size beyond Pillow's decompression-bomb limit."""
+
+_executor = None
+
+
+def _save(image, path, fmt):
+    # Write beside the target and rename, so a half-written file is never served
+    tmp = f"{path}.{os.getpid()}.tmp"
+    if fmt == "JPEG":
+        image.convert("RGB").save(tmp, "JPEG", quality=85, optimize=True, progressive=True)
+    else:
+        image.save(tmp, "WEBP", quality=80, method=4)
+    os.replace(tmp, path)
+
+
+def render_variants(data: bytes, digest: str, directory: str = UPLOAD_DIR):
+    """Store the original and its resized JPEG/WebP variants; runs in a worker process.
+
+    Returns file names relative to `directory`. Files that already exist (the
+    same content uploaded before) are left as they are.
+    """
+    # Only the workers need Pillow
+    from PIL import Image
+
+    try:
+        return _render(data, digest, directory)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except (OSError, SyntaxError) as e:
+        if isinstance(e, OSError) and e.errno is not None:
+            # A real filesystem error (disk full, permissions), not a bad upload
+            raise
+        # Pillow reports unidentified and truncated images as OSErrors, and decodes
+        # lazily, so they can surface at any step; ValueError makes the upload a 400
+        raise ValueError(f"Not a supported image: {e}")
+
+
+def _render(data: bytes, digest: str, directory: str):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as probe:
+        probe.verify()
+    image = Image.open(io.BytesIO(data))
+    ext = FORMATS.get(image.format)
+    if ext is None:
+        raise ValueError(f"Unsupported image format {image.format}")
+
+    os.makedirs(directory, exist_ok=True)
+    names = {"original": f"{digest}.{ext}", "variants": {}}
+    original_path = os.path.join(directory, names["original"])
+    if not os.path.exists(original_path):
+        # Per-process temp name, as in _save: two workers may store the same upload at once
+        tmp = f"{original_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, original_path)
+
+    with image:
+        image = ImageOps.exif_transpose(image)
+        for variant, size in VARIANT_SIZES.items():
+            resized = None
+            names["variants"][variant] = {}
+            for fmt, variant_ext in (("JPEG", "jpg"), ("WEBP", "webp")):
+                name = f"{digest}-{variant}.{variant_ext}"
+                names["variants"][variant][variant_ext] = name
+                path = os.path.join(directory, name)
+                if os.path.exists(path):
+                    continue
+                if resized is None:
+                    resized = image.copy()
+                    resized.thumbnail((size, size), Image.LANCZOS)
+                _save(resized, path, fmt)
+    return names
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn: never fork a process that is running an event loop and driver threads
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+async def store_image(file: UploadFile):
+    """Validate an upload, store it under its content hash and return the product `images` entry."""
+    data = await file.read(UPLOAD_MAX_BYTES + 1)
+    if len(data) > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {UPLOAD_MAX_BYTES} bytes")
+    if not data:
+        raise HTTPException(status_code=400, detail="Empty upload")
+
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    loop = asyncio.get_running_loop()
+    try:
+        names = await loop.run_in_executor(_get_executor(), render_variants, data, digest)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"{file.filename}: {e}")
+
+    return {
+        # `image` stays the full-size URL, as the storefront already reads it
+        "image": f"{UPLOAD_URL}/{names['original']}",
+        "hash": digest,
+        "variants": {
+            variant: {fmt: f"{UPLOAD_URL}/{name}" for fmt, name in formats.items()}
+            for variant, formats in names["variants"].items()
+        },
+    }
+
+
+def shutdown_image_pool():
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+from config.database import db_manager, DRAIN_SECONDS
+
+logger = logging.getLogger("WriteJournal")
+
+REPLAY_BATCH_SIZE = int(os.getenv("JOURNAL_REPLAY_BATCH", "1000"))
+
+journal_stats = {"recorded": 0, "failed": 0, "lastReplay": None}
+
+
+def _journaling(db):
+    # Writes through the active replica client need no journal; everything else
+    # (standalone mode, or a straggler still holding a replaced client) does
+    return not (db_manager.mode == "replica" and db.client is db_manager.client)
+
+
+async def _record(db, collection: str, doc_ids, op: str):
+    if not _journaling(db):
+        return
+    now = datetime.utcnow()
+    await db.write_journal.insert_many([
+        {"collection": collection, "docId": doc_id, "op": op, "at": now}
+        for doc_id in doc_ids
+    ])
+    journal_stats["recorded"] += len(doc_ids)
+
+
+async def record_write(db, collection: str, *doc_ids):
+    """Note that documents were inserted or updated while off the replica set."""
+    await _record(db, collection, doc_ids, "upsert")
+
+
+async def record_delete(db, collection: str, *doc_ids):
+    await _record(db, collection, doc_ids, "delete")
+
+
+async def _replay_collection(source, target, collection: str, ops_by_id: dict):
+    upsert_ids = [doc_id for doc_id, op in ops_by_id.items() if op == "upsert"]
+    docs = {}
+    if upsert_ids:
+        async for doc in source[collection].find({"_id": {"$in": upsert_ids}}):
+            docs[doc["_id"]] = doc
+
+    requests = []
+    ids = []
+    for doc_id in ops_by_id:
+        doc = docs.get(doc_id)
+        if doc is not None:
+            # Copy the standalone's current state; replaying it twice is harmless
+            requests.append(ReplaceOne({"_id": doc_id}, doc, upsert=True))
+        else:
+            requests.append(DeleteOne({"_id": doc_id}))
+        ids.append(doc_id)
+
+    if not requests:
+        return 0, 0
+    try:
+        # Unordered: one conflicting document must not hold back the rest
+        await target[collection].bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        # e.g. a unique email taken on the replica set meanwhile. Retrying would fail the same
+        # way on every failback, so park the write for a person to resolve and move on
+        failed = e.details["writeErrors"]
+        if not failed:
+            # Only a write concern error; the writes may not be durable yet, so retry next time
+            raise
+        now = datetime.utcnow()
+        await target.write_journal_failed.insert_many([{
+            "collection": collection,
+            "docId": ids[error["index"]],
+            "op": ops_by_id[ids[error["index"]]],
+            "document": docs.get(ids[error["index"]]),
+            "code": error.get("code"),
+            "error": error.get("errmsg"),
+            "at": now,
+        } for error in failed])
+        logger.error(f"{len(failed)} journaled writes to {collection} failed on replay; "
+                     f"kept in write_journal_failed")
+        return len(requests) - len(failed), len(failed)
+    return len(requests), 0
+
+
+async def replay_journal(source, target):
+    """Replay journaled writes from `source` (standalone) onto `target` (replica set).
+
+    Entries are read in batches; within a batch only the last operation per
+    document matters, and each collection is written with one unordered bulk_write.
+    Writes the replica set rejects are copied to `write_journal_failed` and
+    counted; they never block the rest of the journal.
+    Returns the replay report, which is also kept in `journal_stats`.
+    """
+    start = time.perf_counter()
+    entries = 0
+    writes = 0
+    failed = 0
+    collections = set()
+
+    while True:
+        batch = await source.write_journal.find().sort("_id", 1).limit(REPLAY_BATCH_SIZE).to_list(length=REPLAY_BATCH_SIZE)
+        if not batch:
+            break
+
+        latest = {}
+        for entry in batch:
+            latest.setdefault(entry["collection"], {})[entry["docId"]] = entry["op"]
+
+        results = await asyncio.gather(*[
+            _replay_collection(source, target, collection, ops_by_id)
+            for collection, ops_by_id in latest.items()
+        ])
+
+        await source.write_journal.delete_many({"_id": {"$in": [entry["_id"] for entry in batch]}})
+        entries += len(batch)
+        writes += sum(done for done, _ in results)
+        failed += sum(errors for _, errors in results)
+        collections.update(latest)
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "entries": entries,
+        "writes": writes,
+        "failed": failed,
+        "collections": sorted(collections),
+        "seconds": round(elapsed, 3),
+        "entriesPerSecond": round(entries / elapsed, 1) if elapsed > 0 else 0.0,
+        "finishedAt": datetime.utcnow().isoformat(),
+    }
+    journal_stats["failed"] += failed
+    if entries:
+        journal_stats["lastReplay"] = report
+        logger.info(f"Replayed {entries} journal entries ({writes} writes, {failed} failed) in {elapsed:.2f}s "
+                    f"({report['entriesPerSecond']}/s)")
+    return report
+
+
+async def failback_with_replay(on_replayed=None):
+    """Fail back to the replica set without losing writes made in standalone mode.
+
+    The bulk of the journal is replayed onto the warm standby before the swap,
+    then the remainder (and any stragglers on the old client) right after it.
+    `on_replayed(target, report)` runs after each pass that replayed something.
+    """
+    source = db_manager.get_db()
+    standby = db_manager.standby
+    if standby is not None and standby.mode == "replica":
+        report = await replay_journal(source, standby.db)
+        if report["entries"] and on_replayed:
+            await on_replayed(standby.db, report)
+
+    await db_manager.failover("replica")
+    if db_manager.mode != "replica":
+        return
+
+    async def catch_up(delay):
+        await asyncio.sleep(delay)
+        try:
+            target = db_manager.get_db()
+            report = await replay_journal(source, target)
+            if report["entries"] and on_replayed:
+                await on_replayed(target, report)
+        except Exception as e:
+            logger.error(f"Journal catch-up replay failed: {e}")
+
+    await catch_up(0)
+    # One last pass before the drained standalone client is closed
+    asyncio.create_task(catch_up(DRAIN_SECONDS / 2))
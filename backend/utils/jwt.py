@@ -1,21 +1,32 @@
 import jwt
+import time
+import uuid
 from datetime import datetime, timedelta
 import os
+from utils.revocation import is_revoked
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your_jwt_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 7
+ACCESS_TOKEN_MAX_AGE = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
+# Clock skew tolerated between the host that issued a token and the one checking it;
+# without it PyJWT rejects a token whose iat is slightly in the future
+CLOCK_SKEW_LEEWAY = float(os.getenv("JWT_LEEWAY", "30"))
 
 def create_access_token(data: dict):
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + ACCESS_TOKEN_MAX_AGE
+    # jti lets a single token be revoked; a fractional iat orders it against revoke-all cutoffs
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], leeway=CLOCK_SKEW_LEEWAY)
     except jwt.PyJWTError:
         return None
+    # In-memory check, no database round trip
+    if is_revoked(payload):
+        return None
+    return payload
@@ -0,0 +1,211 @@
+import bisect
+import threading
+import time
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.values = {}
+        # pymongo listeners fire on executor threads
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self):
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in list(self.values.items())
+        ]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels=(), func=None):
+        super().__init__(name, help, labels)
+        # Optional callable returning {label tuple: value}, read at scrape time
+        self.func = func
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+    def inc(self, *labels, amount=1.0):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self):
+        values = self.values
+        if self.func is not None:
+            try:
+                values = self.func()
+            except Exception:
+                values = {}
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in list(values.items()) if v is not None
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = self.header()
+        for labels, (counts, total, count) in list(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("route", "method")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."))
+http_refused = registry.register(Counter(
+    "http_requests_refused_total", "Requests turned away by rate limiting (429) or load shedding (503).", ("reason",)))
+
+mongo_command_latency = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by command name.", ("command",)))
+mongo_command_errors = registry.register(Counter(
+    "mongodb_command_errors_total", "Failed MongoDB commands by command name.", ("command",)))
+mongo_checkout_wait = registry.register(Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("address",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)))
+mongo_checkout_failures = registry.register(Counter(
+    "mongodb_pool_checkout_failures_total", "Connection checkouts that failed or timed out.", ("address", "reason")))
+mongo_connections_in_use = registry.register(Gauge(
+    "mongodb_pool_connections_in_use", "Pooled connections currently checked out.", ("address",)))
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_latency.observe(event.command_name, value=event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_command_latency.observe(event.command_name, value=event.duration_micros / 1e6)
+        mongo_command_errors.inc(event.command_name)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout wait time, measured on the thread that performs the checkout."""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    @staticmethod
+    def _address(event):
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self.local, "started", None)
+        if started is not None:
+            mongo_checkout_wait.observe(self._address(event), value=time.perf_counter() - started)
+            self.local.started = None
+        mongo_connections_in_use.inc(self._address(event))
+
+    def connection_check_out_failed(self, event):
+        self.local.started = None
+        mongo_checkout_failures.inc(self._address(event), event.reason)
+
+    def connection_checked_in(self, event):
+        mongo_connections_in_use.inc(self._address(event), amount=-1)
+
+    # Remaining pool events are not needed for these metrics
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+
+def mongo_listeners():
+    return [CommandMetrics(), PoolMetrics()]
@@ -0,0 +1,184 @@
+import os
+from datetime import datetime
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from config.database import db_manager
+
+# Same pricing rules the checkout page shows (frontend ConfirmOrder)
+TAX_RATE = float(os.getenv("ORDER_TAX_RATE", "0.05"))
+FREE_SHIPPING_OVER = float(os.getenv("ORDER_FREE_SHIPPING_OVER", "200"))
+SHIPPING_PRICE = float(os.getenv("ORDER_SHIPPING_PRICE", "25"))
+# Reserve stock in a multi-document transaction when on the replica set
+USE_TRANSACTIONS = os.getenv("ORDER_TRANSACTIONS", "true").lower() != "false"
+
+PRODUCT_PROJECTION = {"name": 1, "price": 1, "stock": 1, "images": {"$slice": 1}}
+
+
+def _quantities(order_items):
+    """Requested quantity per product id; repeated lines for one product are merged."""
+    quantities = {}
+    for item in order_items:
+        try:
+            product_id = ObjectId(item.product)
+        except:
+            raise HTTPException(status_code=400, detail=f"Invalid product ID '{item.product}'")
+        if item.quantity < 1:
+            raise HTTPException(status_code=400, detail="Quantity must be at least 1")
+        quantities[product_id] = quantities.get(product_id, 0) + item.quantity
+    if not quantities:
+        raise HTTPException(status_code=400, detail="Order has no items")
+    return quantities
+
+
+def price_items(products: dict, quantities: dict):
+    """Build the order lines and totals from current catalog prices, ignoring client prices."""
+    items = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+        images = product.get("images") or [{}]
+        items.append({
+            "name": product["name"],
+            "quantity": quantity,
+            "image": images[0].get("image", ""),
+            "price": product["price"],
+            "product": str(product_id),
+        })
+
+    items_price = round(sum(i["price"] * i["quantity"] for i in items), 2)
+    tax_price = round(items_price * TAX_RATE, 2)
+    shipping_price = 0.0 if items_price > FREE_SHIPPING_OVER else SHIPPING_PRICE
+    totals = {
+        "itemsPrice": items_price,
+        "taxPrice": tax_price,
+        "shippingPrice": shipping_price,
+        "totalPrice": round(items_price + tax_price + shipping_price, 2),
+    }
+    return items, totals
+
+
+async def _shortfall(db, product_id, products, session=None):
+    """Why a reservation matched nothing: the product is gone (404) or short of stock (409)."""
+    if not await db.products.find_one({"_id": product_id}, {"_id": 1}, session=session):
+        return HTTPException(status_code=404, detail="Product not found")
+    name = products[product_id]["name"] if product_id in products else str(product_id)
+    return HTTPException(status_code=409, detail=f"Insufficient stock for {name}")
+
+
+async def _reserve(db, product_id, quantity, session=None):
+    # Conditional decrement, never an upsert: a reservation can't create a product
+    result = await db.products.update_one(
+        {"_id": product_id, "stock": {"$gte": quantity}}, {"$inc": {"stock": -quantity}}, session=session
+    )
+    return result.modified_count == 1
+
+
+async def _release(db, quantities: dict):
+    if quantities:
+        await db.products.bulk_write([
+            UpdateOne({"_id": product_id}, {"$inc": {"stock": quantity}})
+            for product_id, quantity in quantities.items()
+        ], ordered=False)
+
+
+async def _place_in_transaction(db, quantities, products, order):
+    async def reserve_and_insert(session):
+        # Any exception aborts the transaction, undoing the reservations made so far
+        for product_id, quantity in quantities.items():
+            if not await _reserve(db, product_id, quantity, session):
+                raise await _shortfall(db, product_id, products, session)
+        await db.orders.insert_one(order, session=session)
+
+    async with await db.client.start_session() as session:
+        # Retries on write conflicts between concurrent checkouts of the same product
+        await session.with_transaction(reserve_and_insert)
+
+
+async def _place_with_compensation(db, quantities, products, order):
+    reserved = {}
+    try:
+        for product_id, quantity in quantities.items():
+            if not await _reserve(db, product_id, quantity):
+                raise await _shortfall(db, product_id, products)
+            reserved[product_id] = quantity
+    except BaseException:
+        # Items before the short one were reserved; give their stock back
+        await _release(db, reserved)
+        raise
+
+    try:
+        await db.orders.insert_one(order)
+    except BaseException:
+        # Including cancellation: the order was not written, so neither is the reservation
+        await _release(db, quantities)
+        raise
+
+
+async def place_order(db, order_in, user_id: str, idempotency_key: str = None):
+    """Price, reserve stock for and insert an order. Returns (order, created).
+
+    A retry with the same idempotency key returns the order the first attempt
+    created (created=False) instead of placing a second one.
+    """
+    if idempotency_key:
+        existing = await db.orders.find_one({"user": user_id, "idempotencyKey": idempotency_key})
+        if existing is not None:
+            return existing, False
+
+    quantities = _quantities(order_in.orderItems)
+    products = {
+        p["_id"]: p async for p in db.products.find({"_id": {"$in": list(quantities)}}, PRODUCT_PROJECTION)
+    }
+    items, totals = price_items(products, quantities)
+
+    now = datetime.now()
+    order = {
+        "_id": ObjectId(),
+        "shippingInfo": order_in.shippingInfo.dict(),
+        "orderItems": items,
+        "user": user_id,
+        "paymentInfo": order_in.paymentInfo.dict(),
+        "paidAt": now,
+        **totals,
+        "orderStatus": "Processing",
+        "createdAt": now,
+        # Deleting the order gives this stock back (older orders never reserved any)
+        "stockReserved": True,
+    }
+    if idempotency_key:
+        order["idempotencyKey"] = idempotency_key
+
+    try:
+        if USE_TRANSACTIONS and db_manager.mode == "replica":
+            await _place_in_transaction(db, quantities, products, order)
+        else:
+            await _place_with_compensation(db, quantities, products, order)
+    except DuplicateKeyError:
+        # A concurrent request with the same key won; its stock reservation stands, ours was undone
+        if not idempotency_key:
+            raise
+        existing = await db.orders.find_one({"user": user_id, "idempotencyKey": idempotency_key})
+        if existing is None:
+            raise
+        return existing, False
+
+    return order, True
+
+
+async def release_order_stock(db, order: dict):
+    """Give back the stock a removed order reserved. Returns the ids of the products restocked.
+
+    Delivered orders keep theirs (the goods left the warehouse), as do orders
+    placed before checkout started reserving stock.
+    """
+    if not order.get("stockReserved") or order.get("orderStatus") == "Delivered":
+        return []
+    quantities = {}
+    for item in order.get("orderItems", []):
+        product_id = ObjectId(item["product"])
+        quantities[product_id] = quantities.get(product_id, 0) + item["quantity"]
+    await _release(db, quantities)
+    return list(quantities)
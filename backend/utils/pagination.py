@@ -0,0 +1,66 @@
+import base64
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+
+# Fields a client may page over in cursor mode ("-" prefix means descending)
+SORTABLE_FIELDS = {"_id", "price", "ratings", "createdAt", "numOfReviews"}
+
+
+def parse_sort(sort: str):
+    field = sort.lstrip("-")
+    if field not in SORTABLE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{field}'")
+    direction = -1 if sort.startswith("-") else 1
+    return field, direction
+
+
+def sort_spec(field: str, direction: int):
+    if field == "_id":
+        return [("_id", direction)]
+    # _id breaks ties so the order is total and the cursor is unambiguous
+    return [(field, direction), ("_id", direction)]
+
+
+def encode_cursor(sort: str, doc: dict):
+    field, _ = parse_sort(sort)
+    payload = [sort, doc.get(field) if field != "_id" else None, ObjectId(doc["_id"])]
+    raw = json_util.dumps(payload).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort: str):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        token_sort, value, last_id = json_util.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if token_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return value, last_id
+
+
+def keyset_filter(sort: str, token: str):
+    """Build the filter selecting documents strictly after the cursor position."""
+    field, direction = parse_sort(sort)
+    value, last_id = decode_cursor(token, sort)
+    op = "$gt" if direction == 1 else "$lt"
+
+    if field == "_id":
+        return {"_id": {op: last_id}}
+
+    # Null and missing values sort before everything else, but comparison operators
+    # never match them (a null cursor value would end the walk), so that region is
+    # spelled out: first in ascending order, last in descending order.
+    if value is None:
+        ties = {field: None, "_id": {op: last_id}}
+        if direction == 1:
+            return {"$or": [ties, {field: {"$ne": None}}]}
+        return ties
+    after = [
+        {field: {op: value}},
+        {field: value, "_id": {op: last_id}},
+    ]
+    if direction == -1:
+        after.append({field: None})
+    return {"$or": after}
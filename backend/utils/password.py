@@ -0,0 +1,48 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt releases the GIL, so a thread pool gives real parallelism without pickling overhead
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+# Hash/verify calls allowed to wait or run at once before new ones are turned away
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="password")
+_in_flight = 0
+
+
+async def _run(func, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+
+    _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, func, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def get_password_hash(password):
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password, hashed_password):
+    return await _run(pwd_context.verify, plain_password, hashed_password)
+
+
+def pool_stats():
+    return {"workers": PASSWORD_WORKERS, "queueLimit": PASSWORD_QUEUE_LIMIT, "inFlight": _in_flight}
+
+
+def shutdown_pool():
+    _executor.shutdown(wait=False, cancel_futures=True)
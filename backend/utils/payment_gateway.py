@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+import httpx
+
+logger = logging.getLogger("PaymentGateway")
+
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "https://api.stripe.com")
+PAYMENT_TIMEOUT = float(os.getenv("PAYMENT_TIMEOUT", "10"))
+PAYMENT_MAX_RETRIES = int(os.getenv("PAYMENT_MAX_RETRIES", "3"))
+PAYMENT_POOL_SIZE = int(os.getenv("PAYMENT_POOL_SIZE", "20"))
+BREAKER_THRESHOLD = int(os.getenv("PAYMENT_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.getenv("PAYMENT_BREAKER_RESET", "30"))
+
+# Statuses worth retrying with the same idempotency key
+RETRYABLE_STATUS = {409, 429, 500, 502, 503, 504}
+
+
+class PaymentGatewayError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+class CircuitBreaker:
+    """Fail fast once the gateway keeps failing, then let one probe through after `reset_timeout`."""
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "half-open":
+            # This caller is the probe; re-arm the timer so concurrent callers keep failing
+            # fast until it resolves (or, if it never reports back, until the next window)
+            self.opened_at = time.monotonic()
+            return True
+        return state == "closed"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold or self.state == "half-open":
+            self.opened_at = time.monotonic()
+
+
+def derive_idempotency_key(*parts):
+    return hashlib.sha256(":".join(str(p) for p in parts).encode()).hexdigest()
+
+
+class StripeGateway:
+    def __init__(self):
+        self.client = None
+        self.breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+
+    def _get_client(self):
+        # Created lazily so the keep-alive pool belongs to the running event loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=STRIPE_API_BASE,
+                auth=(os.getenv("STRIPE_SECRET_KEY", ""), ""),
+                timeout=httpx.Timeout(PAYMENT_TIMEOUT, connect=min(PAYMENT_TIMEOUT, 3.0)),
+                limits=httpx.Limits(
+                    max_connections=PAYMENT_POOL_SIZE,
+                    max_keepalive_connections=PAYMENT_POOL_SIZE,
+                ),
+            )
+        return self.client
+
+    async def _post(self, path: str, data: dict, idempotency_key: str):
+        if not self.breaker.allow():
+            raise PaymentGatewayError(503, "Payment gateway temporarily unavailable")
+
+        client = self._get_client()
+        last_error = None
+        for attempt in range(PAYMENT_MAX_RETRIES + 1):
+            if attempt:
+                # Exponential backoff with jitter; the key makes the retry safe
+                await asyncio.sleep(min(0.25 * 2 ** attempt, 4) * random.uniform(0.5, 1.0))
+
+            try:
+                response = await client.post(path, data=data, headers={"Idempotency-Key": idempotency_key})
+            except httpx.TransportError as e:
+                last_error = PaymentGatewayError(502, f"Payment gateway unreachable: {e}")
+                continue
+
+            if response.status_code in RETRYABLE_STATUS:
+                last_error = PaymentGatewayError(502, f"Payment gateway returned {response.status_code}")
+                continue
+
+            try:
+                body = response.json()
+            except ValueError:
+                # An HTML or empty body from a proxy in front of the gateway; treat as transient
+                last_error = PaymentGatewayError(502, f"Payment gateway returned an unreadable {response.status_code} response")
+                continue
+            if response.status_code >= 400:
+                # Card and validation errors are the caller's problem, not the gateway's
+                self.breaker.record_success()
+                message = body.get("error", {}).get("message", "Payment failed")
+                raise PaymentGatewayError(response.status_code, message)
+
+            self.breaker.record_success()
+            return body
+
+        self.breaker.record_failure()
+        logger.error(f"Payment request failed after {PAYMENT_MAX_RETRIES + 1} attempts: {last_error}")
+        raise last_error
+
+    async def create_payment_intent(self, amount: int, currency: str, metadata: dict, idempotency_key: str):
+        data = {"amount": amount, "currency": currency}
+        for key, value in metadata.items():
+            data[f"metadata[{key}]"] = value
+        return await self._post("/v1/payment_intents", data, idempotency_key)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self):
+        return {"breaker": self.breaker.state, "consecutiveFailures": self.breaker.failures}
+
+
+payment_gateway = StripeGateway()
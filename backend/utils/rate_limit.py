@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from config.database import db_manager
+from utils import metrics
+
+logger = logging.getLogger("RateLimit")
+
+
+def _parse_rate(value: str):
+    """'20/60' -> bucket of 20 requests refilled over 60 seconds."""
+    capacity, seconds = value.split("/")
+    return float(capacity), float(capacity) / float(seconds)
+
+
+# Per client IP and per account (email, or reset token) on the expensive auth routes
+IP_LIMIT = _parse_rate(os.getenv("RATE_LIMIT_IP", "20/60"))
+ACCOUNT_LIMIT = _parse_rate(os.getenv("RATE_LIMIT_ACCOUNT", "5/60"))
+# "memory" keeps buckets per process; "mongo" shares them between workers
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+# Take the client address from X-Forwarded-For (only behind a trusted reverse proxy)
+TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+
+# Load shedding: auth routes are refused once the event loop lags this much,
+# everything (but health and metrics) once this many requests are in flight
+SHED_LOOP_LAG = float(os.getenv("SHED_LOOP_LAG", "0.25"))
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "512"))
+LAG_PROBE_INTERVAL = 0.1
+
+# Routes that cost a bcrypt computation or an email send
+LIMITED_PREFIXES = ("/api/v1/login", "/api/v1/register", "/api/v1/password/forgot", "/api/v1/password/reset/")
+EXEMPT_PATHS = {"/", "/metrics", "/health/ready"}
+
+RATE_LIMIT_INDEXES = [
+    # Idle buckets are full again by expiresAt, so they can simply disappear
+    IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+]
+
+admission_stats = {"inFlight": 0, "loopLag": 0.0, "limited": 0, "shed": 0}
+
+
+class MemoryBuckets:
+    """Token buckets kept in this process, bounded by evicting the least recently used."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self.buckets = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float):
+        """Take one token. Returns 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, last = self.buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.maxsize:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class MongoBuckets:
+    """Token buckets shared by all workers: one atomic pipeline update per check, timed by the server clock."""
+
+    def __init__(self, fallback: MemoryBuckets):
+        self.fallback = fallback
+
+    async def take(self, key: str, capacity: float, rate: float):
+        db = db_manager.get_db()
+        if db is None:
+            return await self.fallback.take(key, capacity, rate)
+
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$at", "$$NOW"]}]}, 1000]}
+        refilled = {"$min": [capacity, {"$add": [{"$ifNull": ["$tokens", capacity]}, {"$multiply": [elapsed, rate]}]}]}
+        try:
+            bucket = await db.rate_limits.find_one_and_update(
+                {"_id": key},
+                [
+                    {"$set": {"tokens": refilled, "at": "$$NOW"}},
+                    {"$set": {
+                        "allowed": {"$gte": ["$tokens", 1]},
+                        "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                        "expiresAt": {"$add": ["$$NOW", int(capacity / rate * 1000)]},
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+                projection={"tokens": 1, "allowed": 1},
+            )
+        except Exception as e:
+            # Never turn a store outage into an auth outage
+            logger.warning(f"Shared rate limit store unavailable, using local buckets: {e}")
+            return await self.fallback.take(key, capacity, rate)
+        return 0.0 if bucket["allowed"] else (1 - bucket["tokens"]) / rate
+
+
+_memory = MemoryBuckets()
+buckets = MongoBuckets(_memory) if RATE_LIMIT_STORE == "mongo" else _memory
+
+
+def client_ip(request: Request):
+    if TRUST_PROXY:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def account_key(request: Request):
+    path = request.url.path
+    if path.startswith("/api/v1/password/reset/"):
+        return "reset:" + hashlib.sha256(path.rsplit("/", 1)[-1].encode()).hexdigest()[:32]
+    try:
+        email = json.loads(await request.body()).get("email")
+    except Exception:
+        return None
+    if not isinstance(email, str) or not email:
+        return None
+    return "email:" + email.strip().lower()
+
+
+def _refuse(status_code: int, detail: str, retry_after: float):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def monitor_loop_lag():
+    """Measure how late the event loop wakes up; a busy loop means every request is waiting."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lag = time.perf_counter() - start - LAG_PROBE_INTERVAL
+        # Rise at once, decay gradually, so one quiet tick does not reopen the gate
+        admission_stats["loopLag"] = max(lag, admission_stats["loopLag"] * 0.8)
+
+
+async def admission_control(request: Request, call_next):
+    path = request.url.path
+    if path in EXEMPT_PATHS:
+        return await call_next(request)
+
+    limited = path.startswith(LIMITED_PREFIXES) and request.method == "POST"
+    if admission_stats["inFlight"] >= SHED_MAX_IN_FLIGHT:
+        admission_stats["shed"] += 1
+        metrics.http_refused.inc("in_flight")
+        return _refuse(503, "Server is busy, please try again", 1)
+    if limited and admission_stats["loopLag"] > SHED_LOOP_LAG:
+        admission_stats["shed"] += 1
+        metrics.http_refused.inc("loop_lag")
+        return _refuse(503, "Server is busy, please try again", 1 + admission_stats["loopLag"])
+
+    if limited:
+        wait = await buckets.take(f"ip:{client_ip(request)}", *IP_LIMIT)
+        account = await account_key(request)
+        if not wait and account:
+            wait = await buckets.take(account, *ACCOUNT_LIMIT)
+        if wait:
+            admission_stats["limited"] += 1
+            metrics.http_refused.inc("rate_limit")
+            return _refuse(429, "Too many requests, please try again later", wait)
+
+    admission_stats["inFlight"] += 1
+    try:
+        return await call_next(request)
+    finally:
+        admission_stats["inFlight"] -= 1
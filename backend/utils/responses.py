@@ -0,0 +1,29 @@
+import orjson
+from bson import ObjectId, Decimal128
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    # orjson handles datetime, date and UUID itself; only BSON types reach here
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+class BSONResponse(JSONResponse):
+    """JSON response that serializes raw Motor documents (ObjectId, datetime, Decimal128) directly.
+
+    Return it from a handler instead of a dict: FastAPI then skips
+    jsonable_encoder, so documents need no per-field ObjectId conversion.
+    Headers set on an injected `Response` are not applied to it, so cookies
+    must be set on the returned instance.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,88 @@
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Reviews embedded in the product detail response
+DETAIL_REVIEW_LIMIT = 20
+
+
+REVIEW_INDEXES = [
+    # One review per user per product
+    IndexModel([("product", ASCENDING), ("user", ASCENDING)], unique=True, name="product_user_unique"),
+    # Cursor pagination of a product's reviews
+    IndexModel([("product", ASCENDING), ("_id", ASCENDING)], name="product_id"),
+]
+
+
+async def ensure_review_indexes(db):
+    await db.reviews.create_indexes(REVIEW_INDEXES)
+
+
+async def apply_rating_delta(db, product_id: ObjectId, sum_delta: float, count_delta: int):
+    """Adjust the running rating sum/count and the derived average in one atomic update."""
+    await db.products.update_one({"_id": product_id}, [
+        {"$set": {
+            "ratingSum": {"$add": [{"$ifNull": ["$ratingSum", 0]}, sum_delta]},
+            "numOfReviews": {"$add": [{"$ifNull": ["$numOfReviews", 0]}, count_delta]},
+        }},
+        {"$set": {
+            "ratings": {"$cond": [
+                {"$gt": ["$numOfReviews", 0]},
+                {"$divide": ["$ratingSum", "$numOfReviews"]},
+                0,
+            ]},
+        }},
+    ])
+
+
+async def upsert_review(db, product_id: ObjectId, user: dict, rating: float, comment: str):
+    """Create or update the user's review and return its _id."""
+    now = datetime.utcnow()
+    new_id = ObjectId()
+    for attempt in range(2):
+        try:
+            previous = await db.reviews.find_one_and_update(
+                {"product": product_id, "user": ObjectId(user["_id"])},
+                {
+                    "$set": {"name": user["name"], "rating": rating, "comment": comment, "updatedAt": now},
+                    "$setOnInsert": {"_id": new_id, "createdAt": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+            break
+        except DuplicateKeyError:
+            # Two concurrent first reviews raced on the insert; the retry takes the update path
+            if attempt:
+                raise
+
+    if previous is None:
+        await apply_rating_delta(db, product_id, rating, 1)
+        return new_id
+    if previous["rating"] != rating:
+        await apply_rating_delta(db, product_id, rating - previous["rating"], 0)
+    return previous["_id"]
+
+
+async def remove_review(db, product_id: ObjectId, review_id: ObjectId):
+    removed = await db.reviews.find_one_and_delete({"_id": review_id, "product": product_id})
+    if removed is None:
+        return False
+    await apply_rating_delta(db, product_id, -removed["rating"], -1)
+    return True
+
+
+async def list_reviews(db, product_id: ObjectId, after: ObjectId = None, limit: int = DETAIL_REVIEW_LIMIT):
+    query = {"product": product_id}
+    if after is not None:
+        query["_id"] = {"$gt": after}
+
+    cursor = db.reviews.find(query).sort("_id", ASCENDING).limit(limit + 1)
+    reviews = await cursor.to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        next_cursor = str(reviews[-1]["_id"])
+    return reviews, next_cursor
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, IndexModel
+from config.database import db_manager
+from utils.journal import record_write
+
+logger = logging.getLogger("Revocation")
+
+# Without a change stream (standalone mode) other workers' revocations arrive by polling
+SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "5"))
+PRUNE_INTERVAL = 60
+# Pull a little before the last seen revocation to allow for clock skew between workers
+SYNC_OVERLAP = timedelta(seconds=float(os.getenv("REVOCATION_SYNC_OVERLAP", "10")))
+# Revoke-all cutoffs come from the revoking host's clock, iat from the issuing host's, so a
+# token issued just after the cutoff by a host running behind must still pass. Kept well
+# below JWT_LEEWAY: tokens issued this long before a revoke-all survive it.
+CUTOFF_SKEW = float(os.getenv("REVOCATION_CUTOFF_SKEW", "5"))
+
+REVOCATION_INDEXES = [
+    # Entries are only needed until the tokens they cover would have expired anyway
+    IndexModel([("expiresAt", ASCENDING)], expireAfterSeconds=0, name="expires_ttl"),
+    # Delta pulls
+    IndexModel([("revokedAt", ASCENDING)], name="revoked_at"),
+]
+
+# In-process mirror of revoked_tokens, checked on every request with no I/O:
+#   jti -> token expiry (unix seconds), user id -> tokens issued before this time are revoked
+_revoked_jtis = {}
+_user_cutoffs = {}
+revocation_stats = {"jtis": 0, "users": 0, "lastSync": None, "source": None}
+
+
+def is_revoked(payload: dict):
+    if payload.get("jti") in _revoked_jtis:
+        return True
+    cutoff = _user_cutoffs.get(payload.get("id"))
+    # Tokens from before jti/iat existed have no iat and fall under any cutoff
+    return cutoff is not None and payload.get("iat", 0) < cutoff[0] - CUTOFF_SKEW
+
+
+def _apply(doc: dict):
+    # Stored datetimes come back naive but are UTC
+    expires = doc["expiresAt"].replace(tzinfo=timezone.utc).timestamp()
+    if doc.get("kind") == "user":
+        current = _user_cutoffs.get(doc["user"])
+        if current is None or current[0] < doc["before"]:
+            _user_cutoffs[doc["user"]] = (doc["before"], expires)
+    else:
+        _revoked_jtis[doc["_id"]] = expires
+
+
+def _prune():
+    now = time.time()
+    for jti in [j for j, expires in _revoked_jtis.items() if expires < now]:
+        del _revoked_jtis[jti]
+    for user in [u for u, (_, expires) in _user_cutoffs.items() if expires < now]:
+        del _user_cutoffs[user]
+    revocation_stats["jtis"] = len(_revoked_jtis)
+    revocation_stats["users"] = len(_user_cutoffs)
+
+
+async def _store(doc: dict):
+    _apply(doc)
+    db = db_manager.get_db("auth")
+    await db.revoked_tokens.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+    await record_write(db, "revoked_tokens", doc["_id"])
+
+
+async def revoke_token(payload: dict):
+    """Revoke one token (logout). Tokens without a jti can only be revoked per user."""
+    if not payload.get("jti"):
+        return
+    await _store({
+        "_id": payload["jti"],
+        "kind": "token",
+        "user": payload.get("id"),
+        "revokedAt": datetime.utcnow(),
+        "expiresAt": datetime.utcfromtimestamp(payload["exp"]),
+    })
+
+
+async def revoke_all_for_user(user_id, max_age: timedelta):
+    """Revoke every token issued to the user until now (password change/reset, account removal)."""
+    now = datetime.utcnow()
+    await _store({
+        "_id": f"user:{user_id}",
+        "kind": "user",
+        "user": str(user_id),
+        "before": time.time(),
+        "revokedAt": now,
+        # Any token this could still match expires within max_age
+        "expiresAt": now + max_age,
+    })
+
+
+async def _pull(db, since):
+    query = {"revokedAt": {"$gte": since - SYNC_OVERLAP}} if since else {}
+    latest = since
+    async for doc in db.revoked_tokens.find(query):
+        _apply(doc)
+        if latest is None or doc["revokedAt"] > latest:
+            latest = doc["revokedAt"]
+    return latest
+
+
+async def sync_revocations():
+    """Keep the in-process mirror current: full load, then a change stream or delta pulls."""
+    logger.info("Starting token revocation sync...")
+    since = None
+    while True:
+        db = db_manager.get_db("auth")
+        if db is None:
+            await asyncio.sleep(SYNC_INTERVAL)
+            continue
+
+        try:
+            since = await _pull(db, since)
+            _prune()
+            revocation_stats["lastSync"] = datetime.utcnow().isoformat()
+
+            if db_manager.mode == "replica":
+                revocation_stats["source"] = "changeStream"
+                pipeline = [{"$match": {"operationType": {"$in": ["insert", "replace", "update"]}}}]
+                async with db.revoked_tokens.watch(
+                    pipeline, full_document="updateLookup", max_await_time_ms=int(SYNC_INTERVAL * 1000)
+                ) as stream:
+                    # Catch anything written between the pull and the stream opening
+                    since = await _pull(db, since)
+                    pruned = time.monotonic()
+                    while stream.alive:
+                        change = await stream.try_next()
+                        doc = change.get("fullDocument") if change else None
+                        if doc is not None:
+                            _apply(doc)
+                            since = max(since or doc["revokedAt"], doc["revokedAt"])
+                        if time.monotonic() - pruned > PRUNE_INTERVAL:
+                            _prune()
+                            pruned = time.monotonic()
+                        revocation_stats["jtis"] = len(_revoked_jtis)
+                        revocation_stats["users"] = len(_user_cutoffs)
+            else:
+                revocation_stats["source"] = "poll"
+                await asyncio.sleep(SYNC_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Revocation sync interrupted: {e}")
+            await asyncio.sleep(SYNC_INTERVAL)
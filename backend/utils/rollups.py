@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+from pymongo import UpdateOne
+
+logger = logging.getLogger("Rollups")
+
+# Documents in sales_rollups are keyed "<kind>:<key>", e.g. "day:2025-12-07" or "status:Delivered"
+TOTAL_ID = "total:all"
+
+
+def _inc(kind: str, key: str, inc: dict):
+    return UpdateOne(
+        {"_id": f"{kind}:{key}"},
+        {"$inc": inc, "$setOnInsert": {"kind": kind, "key": key}},
+        upsert=True
+    )
+
+
+def _order_ops(order: dict, sign: int):
+    revenue = sign * order.get("totalPrice", 0)
+    inc = {"revenue": revenue, "orders": sign}
+    created_at = order.get("createdAt") or datetime.now()
+
+    ops = [
+        _inc("total", "all", inc),
+        _inc("day", created_at.strftime("%Y-%m-%d"), inc),
+        _inc("status", order.get("orderStatus", "Processing"), inc),
+    ]
+    for item in order.get("orderItems", []):
+        ops.append(_inc("product", str(item["product"]), {
+            "revenue": sign * item["price"] * item["quantity"],
+            "quantity": sign * item["quantity"],
+            "orders": sign,
+        }))
+    return ops
+
+
+async def record_order(db, order: dict, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) one order's contribution to every rollup."""
+    await db.sales_rollups.bulk_write(_order_ops(order, sign), ordered=False)
+
+
+async def record_status_change(db, order: dict, new_status: str):
+    old_status = order.get("orderStatus", "Processing")
+    if old_status == new_status:
+        return
+    revenue = order.get("totalPrice", 0)
+    await db.sales_rollups.bulk_write([
+        _inc("status", old_status, {"revenue": -revenue, "orders": -1}),
+        _inc("status", new_status, {"revenue": revenue, "orders": 1}),
+    ], ordered=False)
+
+
+async def get_total(db):
+    doc = await db.sales_rollups.find_one({"_id": TOTAL_ID})
+    if doc is None:
+        return {"revenue": 0, "orders": 0}
+    return {"revenue": doc.get("revenue", 0), "orders": doc.get("orders", 0)}
+
+
+def _merge_stages(kind: str, stamp: datetime):
+    return [
+        {"$set": {"kind": kind, "key": "$_id", "rebuiltAt": stamp}},
+        {"$set": {"_id": {"$concat": [f"{kind}:", {"$toString": "$_id"}]}}},
+        {"$merge": {"into": "sales_rollups", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def rebuild_rollups(db):
+    """Recompute every rollup from the orders collection with aggregation pipelines."""
+    stamp = datetime.utcnow()
+    order_totals = {"revenue": {"$sum": "$totalPrice"}, "orders": {"$sum": 1}}
+
+    pipelines = {
+        "total": [{"$group": {"_id": "all", **order_totals}}],
+        "day": [{"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+            **order_totals
+        }}],
+        "status": [{"$group": {"_id": {"$ifNull": ["$orderStatus", "Processing"]}, **order_totals}}],
+        "product": [
+            {"$unwind": "$orderItems"},
+            {"$group": {
+                "_id": "$orderItems.product",
+                "revenue": {"$sum": {"$multiply": ["$orderItems.price", "$orderItems.quantity"]}},
+                "quantity": {"$sum": "$orderItems.quantity"},
+                "orders": {"$sum": 1},
+            }},
+        ],
+    }
+    for kind, pipeline in pipelines.items():
+        await db.orders.aggregate(pipeline + _merge_stages(kind, stamp)).to_list(length=None)
+
+    # Anything not touched by this rebuild no longer has matching orders
+    stale = await db.sales_rollups.delete_many({"rebuiltAt": {"$ne": stamp}})
+    logger.info(f"Rebuilt sales rollups ({stale.deleted_count} stale entries removed).")
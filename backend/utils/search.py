@@ -0,0 +1,36 @@
+import logging
+import os
+from pymongo import TEXT, IndexModel
+
+logger = logging.getLogger("Search")
+
+# "text" uses the weighted text index below, "regex" keeps the old unanchored name match
+SEARCH_MODE = os.getenv("PRODUCT_SEARCH_MODE", "text")
+
+TEXT_INDEX_NAME = "product_text_search"
+TEXT_INDEX_WEIGHTS = {"name": 10, "category": 5, "description": 1}
+
+TEXT_INDEX = IndexModel(
+    [(field, TEXT) for field in TEXT_INDEX_WEIGHTS],
+    name=TEXT_INDEX_NAME,
+    weights=TEXT_INDEX_WEIGHTS,
+    default_language="english",
+)
+
+
+async def ensure_search_index(db):
+    await db.products.create_indexes([TEXT_INDEX])
+    logger.info("Product text index ready.")
+
+
+def keyword_filter(keyword: str):
+    if SEARCH_MODE == "regex":
+        return {"name": {"$regex": keyword, "$options": "i"}}
+    return {"$text": {"$search": keyword}}
+
+
+def is_text_query(query: dict):
+    return "$text" in query
+
+
+TEXT_SCORE = {"score": {"$meta": "textScore"}}
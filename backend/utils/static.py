@@ -0,0 +1,24 @@
+import os
+import re
+from fastapi.staticfiles import StaticFiles
+
+# Content-addressed names (utils/images) never change meaning, so they can be cached forever
+HASHED_NAME = re.compile(r"^[0-9a-f]{32}(-[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+MUTABLE = os.getenv("UPLOADS_CACHE_CONTROL", "public, max-age=3600")
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """StaticFiles with long-lived caching for content-hashed files.
+
+    FileResponse already answers Range requests (206 with Content-Range) and
+    advertises Accept-Ranges; this only adds Cache-Control.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if HASHED_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers["Cache-Control"] = MUTABLE
+        return response
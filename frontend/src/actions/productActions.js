@@ -6,7 +6,7 @@ export const getProducts = (keyword, price, category, rating, currentPage = 1) =
 
     try {  
         dispatch(productsRequest()) 
-        let link = `/api/v1/products?page=${currentPage}`;
+        let link = `/api/v1/products?page=${currentPage}&fields=card`;
         
         if(keyword) {
             link += `&keyword=${keyword}`